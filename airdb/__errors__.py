@@ -24,3 +24,34 @@ class DatabaseVersionError(Exception):
                 f"{target_version}. Current version is {db_version}."
         self.message = message
         super().__init__(self.message)
+
+
+class DeltaError(Exception):
+    """Exception raised for delta packages that cannot be applied."""
+
+
+class StaleMirrorError(Exception):
+    """Exception raised for Parquet mirrors of another version of data."""
+
+
+class ChecksumError(Exception):
+    """Exception raised for files with mismatched checksum."""
+
+    def __init__(self, path, expected, actual, message=None):
+        """
+        Create a ChecksumError.
+
+        Args:
+            path     (str): Path to file
+            expected (str): Expected digest
+            actual   (str): Digest of file
+            message  (str): Error message
+        """
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+        if message is None:
+            message = f"Checksum of '{path}' is {actual} but {expected} " + \
+                "is expected."
+        self.message = message
+        super().__init__(self.message)
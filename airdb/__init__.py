@@ -15,22 +15,40 @@ date    : 2021
 
 # pylint: disable=C0103, C0201
 from contextlib import closing as _closing
-from time import time as _time
+from contextlib import contextmanager as _contextmanager
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from functools import partial as _partial
+from itertools import chain as _chain
+from itertools import islice as _islice
+from types import GeneratorType as _GeneratorType
 # from warnings import warn as _warn
 # import itertools as _itertools
 # from collections.abc import Iterable as _Iterable
 
+import asyncio as _asyncio
+import multiprocessing as _multiprocessing
 import os as _os
+import sqlite3 as _sqlite3
+import threading as _threading
 from os import path as _path
-import sqlite3 as _sq
 import pandas as _pd
 import xarray as _xr
 import numpy as _np
 
 from .config import Options as _Options
+from .catalog import Catalog as _Catalog
+from .cache import ResultCache as _ResultCache
+from .cache import sizeof as _sizeof
+from .pool import ConnectionPool as _ConnectionPool
+from .pool import connect as _connect
+from .stats import QueryStats as _QueryStats
+from .stats import nrows as _nrows
+from .stats import timer as _timer
 from . import utils as _utils
 from .utils import Build as _build
 from .__errors__ import DatabaseVersionError as _DatabaseVersionError
+from .__errors__ import StaleMirrorError as _StaleMirrorError
 
 __version__ = '0.2.0'
 __author__ = 'Ismail SEZEN'
@@ -183,6 +201,20 @@ class DatabaseQueryArguments:
         return [v for v in self._args.values()
                 if v is not None and v != '']
 
+    def canonical(self):
+        """
+        Get a hashable canonical form of arguments.
+
+        Names are converted to ascii and lists are sorted, so arguments
+        giving the same query result have the same canonical form.
+        """
+        def _canonical_(v):
+            if isinstance(v, list):
+                v = sorted(set(_canonical_(i) for i in v), key=str)
+                return v[0] if len(v) == 1 else tuple(v)
+            return _utils.to_ascii(str(v))
+        return tuple((k, _canonical_(v)) for k, v in sorted(self))
+
     def to_dict(self, all_args=False):
         """Get dict of vargument values."""
         if all_args:
@@ -197,43 +229,165 @@ class Database:
     _keys_date = ('date', 'year', 'month', 'day', 'hour', 'week', 'doy', 'hoy')
     _keys = ('param', 'reg', 'city', 'sta', 'lat', 'lon') + _keys_date + \
             ('value',)
+    _freqs = {'D': ('year', 'month', 'day'), 'M': ('year', 'month'),
+              'Y': ('year',), 'hour-of-day': ('hour',)}
+    _stats = {'mean': 'AVG', 'min': 'MIN', 'max': 'MAX', 'sum': 'SUM',
+              'count': 'COUNT'}
+    _return_types = ('gen', 'list', 'long_list', 'df', 'xarray', 'numpy',
+                     'arrow', 'xarray_lazy', 'wide')
+    _engines = ('sqlite', 'parquet')
+    # recommended indexes as name: (table, columns)
+    _indexes = {
+        'idx_data_param_sta_date': ('data', 'param, sta, date, value'),
+        'idx_cal_date': ('cal', 'date'),
+        'idx_sta_city': ('sta', 'city'),
+        'idx_measurement_param_sta': ('measurement', 'param, sta, value')}
+    # numpy dtypes of columnar results, None is categorical
+    _dtypes = dict(zip(_keys, [None] * 4 + ['float64'] * 2 +
+                       ['datetime64[ns]'] + ['int64'] * 7 + ['float64']))
     # %%--------
 
-    def __init__(self, name, return_type='gen'):
+    def __init__(self, name, return_type='gen', cache_size=None,
+                 pool_size=0, stats_callback=None, engine='sqlite'):
         """
         Create a Database object.
 
         Args:
             name        (str): Database name without extension
-            return_type (str): One of gen, list, long_list, [df], xarray
+            return_type (str): One of gen, list, long_list, [df], xarray,
+                               numpy, arrow, xarray_lazy, wide
+            cache_size  (int): Maximum size of query result cache in bytes.
+                               0 disables the cache. Default is
+                               options.cache_size.
+            pool_size   (int): If greater than 0, Database object can be
+                               shared between threads and each query
+                               borrows a read-only connection from a pool
+                               of at most pool_size connections. gen
+                               results hold their connection until they
+                               are consumed or closed and a query which
+                               needs a connection while its thread holds
+                               all of them raises RuntimeError.
+            stats_callback (callable): Called with QueryStats of each query
+                               when query result is complete. For lazy
+                               results, it is called when result is
+                               consumed.
+            engine      (str): sqlite or parquet. parquet engine reads
+                               data of query from Parquet mirror created
+                               by build_parquet_mirror. Metadata and
+                               aggregate are always read from sqlite.
         """
-        return_types = ['gen', 'list', 'long_list', 'df', 'xarray']
         self._name = name
         self._path = _path.join(options.db_path, name + '.db')
         if not _path.exists(self._path):
             raise FileNotFoundError('Database ' + name + ' cannot be found')
 
-        if return_type not in return_types:
-            raise TypeError("return_type must be one of " + str(return_types))
+        Database._check_return_type(return_type)
+        if engine not in Database._engines:
+            raise ValueError('engine must be one of ' +
+                             str(list(Database._engines)))
         self._return_type = return_type
-        self._con = _sq.connect(self._path, detect_types=_sq.PARSE_DECLTYPES)
-        self._cur = self._con.cursor()
+        self._engine = engine
+        self._mirror = None
+        self._con = None
+        self._pool = None
+        self._executor = None
+        self._processes = None
+        self._thread = _threading.get_ident()
+        self._local = _threading.local()
+        self._thread_cons = []
+        if pool_size > 0:
+            self._pool = _ConnectionPool(
+                self._path, pool_size,
+                cached_statements=options.cached_statements)
+        else:
+            self._con = self._connect()
+        self._lock = _threading.RLock()
+        self._cal = None
+        self._cal_text = None
+        self._data_max_date = None
+        self._catalog = None
+        self._label_cache = None
         target_version = 0.3
         if self.version < target_version:
             raise _DatabaseVersionError(self.version, target_version)
+        if cache_size is None:
+            cache_size = options.cache_size
+        self._cache = _ResultCache(cache_size) if cache_size > 0 else None
+        self._stamp = self._get_stamp()
+        self._stats_callback = stats_callback
+        if engine == 'parquet':
+            self._mirror = self._open_mirror()
         # self._set_table_method('id,name,lat,lon', 'reg', 'region')
 
+    @staticmethod
+    def _check_return_type(return_type):
+        """Raise TypeError if return_type is not known."""
+        if return_type not in Database._return_types:
+            raise TypeError("return_type must be one of " +
+                            str(list(Database._return_types)))
+
     def __enter__(self):
         """Return self in with statement."""
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Close database connection when exit from with."""
-        self._con.close()
+        self.close()
 
     def __del__(self):
         """If Database deleted, close connection."""
-        self._con.close()
+        self.close()
+
+    def close(self):
+        """Close database connection(s)."""
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if getattr(self, '_processes', None) is not None:
+            self._processes[1].shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+        if getattr(self, '_pool', None) is not None:
+            self._pool.close()
+        if getattr(self, '_con', None) is not None:
+            self._con.close()
+        for con in getattr(self, '_thread_cons', []):
+            con.close()
+
+    def _connect(self, check_same_thread=True):
+        """Open a new connection to database."""
+        return _connect(self._path, check_same_thread=check_same_thread,
+                        cached_statements=options.cached_statements)
+
+    @_contextmanager
+    def _connection(self):
+        """
+        Get a connection to database.
+
+        In pooled mode a connection is borrowed from the pool until the
+        with block exits. Otherwise the connection of the object is used
+        in the thread which created the object and other threads (such as
+        the executor of async methods) open a connection of their own.
+        """
+        if self._pool is not None:
+            with self._pool.connection() as con:
+                yield con
+        elif _threading.get_ident() == self._thread:
+            yield self._con
+        else:
+            con = getattr(self._local, 'con', None)
+            if con is None:
+                # closed by close() from the thread of the object
+                con = self._connect(check_same_thread=False)
+                self._local.con = con
+                with self._lock:
+                    self._thread_cons.append(con)
+            yield con
+
+    def _execute(self, sql, params=()):
+        """Execute a query and fetch all rows."""
+        with self._connection() as con:
+            with _closing(con.cursor()) as cur:
+                return cur.execute(sql, params).fetchall()
 
     # %%--------
 
@@ -247,30 +401,290 @@ class Database:
         """Name of database."""
         return self._name
 
+    @property
+    def engine(self):
+        """Query engine, sqlite or parquet."""
+        return self._engine
+
+    @property
+    def last_stats(self):
+        """QueryStats of last query in current thread."""
+        return getattr(self._local, 'stats', None)
+
     @property
     def version(self):
         """Database version."""
-        sql = 'SELECT value FROM version'
-        self._cur = self._con.cursor().execute(sql)
-        v = self._return('list', 'value')[0][0]
+        v = self._execute('SELECT value FROM version')[0][0]
         v = "".join(i for i in v if i in "0123456789.")
         return float(v)
 
+    @property
+    def catalog(self):
+        """In-memory catalog of metadata tables."""
+        with self._lock:
+            if self._catalog is None:
+                with self._connection() as con:
+                    self._catalog = _Catalog(con)
+            return self._catalog
+
+    def _labels(self):
+        """
+        Get label codes of catalog tables.
+
+        Names of param and reg and Turkish names of city and sta are
+        factorized once per catalog, so that name columns of results are
+        pandas.Categorical on shared categories.
+
+        Return (dict):
+            A dict of column name: (codes aligned with catalog table rows,
+            CategoricalDtype)
+        """
+        with self._lock:
+            cat = self.catalog
+            if self._label_cache is None or self._label_cache[0] is not cat:
+                codes = {}
+                for k, c in (('param', 'name'), ('reg', 'name'),
+                             ('city', 'nametr'), ('sta', 'nametr')):
+                    x, uniques = _pd.factorize(
+                        _np.asarray(cat.tables[k][c], dtype=object))
+                    codes[k] = x, _pd.CategoricalDtype(uniques)
+                self._label_cache = cat, codes
+            return self._label_cache[1]
+
+    def _categories(self):
+        """CategoricalDtype of each label column from catalog."""
+        return {k: v[1] for k, v in self._labels().items()}
+
+    def refresh_catalog(self):
+        """Reload in-memory catalog of metadata tables from database."""
+        with self._lock, self._connection() as con:
+            self._catalog = _Catalog(con)
+
+    def _open_mirror(self):
+        """
+        Open Parquet mirror of data table.
+
+        Raises StaleMirrorError if mirror is not built from current data.
+        """
+        from . import parquet  # pylint: disable=C0415
+        with self._connection() as con:
+            data_stamp = parquet.stamp(con)
+        return parquet.Mirror(parquet.mirror_path(self._path), data_stamp)
+
+    def build_parquet_mirror(self):
+        """
+        Export data table to a Parquet mirror.
+
+        Mirror is a Parquet dataset next to database file partitioned by
+        param and year and used by parquet engine. Stamp of data is stored
+        in mirror and queries of parquet engine raise StaleMirrorError
+        after database is updated until mirror is built again. Requires
+        pyarrow.
+
+        Return (str):
+            Path to mirror
+        """
+        from . import parquet  # pylint: disable=C0415
+        try:
+            self._check_stamp()
+        except _StaleMirrorError:
+            pass
+        path = parquet.mirror_path(self._path)
+        params = self.catalog.tables['param']['id'].tolist()
+        cal = self._calendar()
+        with self._connection() as con:
+            parquet.build(con, path, params, cal)
+        if self._engine == 'parquet':
+            with self._lock:
+                self._mirror = self._open_mirror()
+        return path
+
+    def _get_stamp(self):
+        """Get modification time, size and version of database file."""
+        st = _os.stat(self._path)
+        v = self._execute('SELECT value FROM version')
+        # appended rows can be in write-ahead log only
+        wal = self._path + '-wal'
+        w = _os.stat(wal) if _path.exists(wal) else None
+        return (st.st_mtime_ns, st.st_size, tuple(v),
+                None if w is None else (w.st_mtime_ns, w.st_size))
+
+    def _check_stamp(self):
+        """
+        Drop cached results and tables if database file is changed.
+
+        It is called at the start of each query, so that calendar, catalog
+        and maximum date cached per Database object are reloaded after
+        another process writes to the database. Parquet mirror is opened
+        again and StaleMirrorError is raised until it is built again from
+        changed data.
+        """
+        stamp = self._get_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._cal = None
+                self._cal_text = None
+                self._data_max_date = None
+                self._catalog = None
+                if self._cache is not None:
+                    self._cache.clear()
+                if self._engine == 'parquet':
+                    self._mirror = self._open_mirror()
+                self._stamp = stamp
+
+    def cache_info(self):
+        """
+        Query result cache statistics.
+
+        Return (CacheInfo):
+            hits, misses, evictions, entries, nbytes and max_bytes of cache
+            or None if cache is disabled.
+        """
+        if self._cache is None:
+            return None
+        with self._lock:
+            return self._cache.info()
+
+    def cache_clear(self):
+        """Remove all cached query results."""
+        if self._cache is not None:
+            with self._lock:
+                self._cache.clear()
+
+    def ensure_indexes(self):
+        """
+        Create recommended indexes and update statistics of query planner.
+
+        data table is indexed by param, sta and date as queried by query
+        and the index covers value, so data rows are read from the index
+        only. Indexes are created on a new writable connection, so this
+        fails if options.read_only or options.immutable is set.
+
+        Return (list):
+            Names of created indexes
+        """
+        with _closing(_connect(self._path)) as con:
+            return Database._create_indexes(con)
+
+    @staticmethod
+    def _create_indexes(con):
+        """Create missing recommended indexes on a writable connection."""
+        existing = {r[0] for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        created = [k for k in Database._indexes if k not in existing]
+        with con:
+            for k in created:
+                table, columns = Database._indexes[k]
+                con.execute(f'CREATE INDEX {k} ON {table} ({columns})')
+            con.execute('ANALYZE')
+        return created
+
+    def update(self, pth, checksum=None, progress=None):
+        """
+        Apply a delta package to database.
+
+        A delta package contains new rows of cal, data and measurement
+        tables created by airdb.delta.create or airdb.delta.diff. It is
+        checked against version table and the last applied delta and its
+        rows are appended in a single transaction, so an update costs
+        proportional to new data. Cached results and tables are dropped.
+        Parquet mirror must be built again after update, queries of
+        parquet engine raise StaleMirrorError until then.
+
+        Args:
+            pth      (str): A local path or URL to delta file
+            checksum (str): '<algorithm>:<hex digest>' or a sha256 hex
+                            digest of delta file
+            progress (callable): Called with received and total bytes
+                            while downloading delta file. Total is None
+                            if unknown.
+        Return (dict):
+            Number of appended rows of cal, data and measurement tables
+        """
+        from . import delta  # pylint: disable=C0415
+        path_to_file, downloaded = Database._fetch(pth, checksum, progress)
+        with _closing(_connect(self._path)) as con:
+            n = delta.apply(con, path_to_file)
+        if downloaded:
+            _os.remove(path_to_file)
+        try:
+            self._check_stamp()
+        except _StaleMirrorError:
+            pass
+        return n
+
+    def deltas(self):
+        """
+        Get applied delta packages.
+
+        Return (DataFrame):
+            id, base and applied time of deltas in order of application
+        """
+        from . import delta  # pylint: disable=C0415
+        with self._connection() as con:
+            rows = delta.applied(con)
+        return _pd.DataFrame(rows, columns=['id', 'base', 'applied'])
+
+    def query_plan(self, query):
+        """
+        Get query plan of a query.
+
+        Args:
+            query (tuple): sql statement, its parameters and optionally
+                           temporary tables
+        Return (list):
+            Lines of EXPLAIN QUERY PLAN output indented by depth in plan
+        """
+        with self._connection() as con:
+            return Database._query_plan(con, query)
+
+    @staticmethod
+    def _query_plan(con, query):
+        """Get query plan of a query on a connection."""
+        with Database._with_temp_tables(con, query), \
+                _closing(con.cursor()) as cur:
+            rows = cur.execute('EXPLAIN QUERY PLAN ' + query[0].strip(),
+                               query[1]).fetchall()
+        depth = {}
+        lines = []
+        for i, parent, _, detail in rows:
+            depth[i] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[i] + detail)
+        return lines
+
+    def _print_query(self, query, verbose=False, explain=False, con=None):
+        """Print a query and its query plan."""
+        if verbose:
+            print(query[0])
+            print('Parameters:', query[1])
+            for name, ids in (query[2] if len(query) > 2 else {}).items():
+                print(f'Temporary table {name}: {len(ids)} ids')
+        if verbose or explain:
+            if isinstance(query[1], dict):
+                # query of parquet engine
+                plan = [query[0]]
+            elif con is None:
+                plan = self.query_plan(query)
+            else:
+                plan = Database._query_plan(con, query)
+            print('Query plan:')
+            print('\n'.join(plan))
+
     @property
     def is_open(self):
         """Check if connection to the database is open."""
         try:
-            self._con.cursor()
+            self._execute('SELECT 1')
             return True
         except Exception:  # pylint: disable=W0703
             return False
 
-    def _return(self, return_type, columns):
+    @staticmethod
+    def _return(rows, return_type, columns):
 
         def generator():
-            for i in self._cur:
+            for i in rows:
                 yield list(i)
-            self._cur.close()
 
         ret = generator()
         if return_type == 'list':
@@ -296,11 +710,10 @@ class Database:
                 return_type (str): One of gen, list, long_list, [df]
             """)
         def _table(name=None, return_type='df'):
-            sql = f'SELECT {sel} FROM {table_name}'
-            if name is not None:
-                sql += f' WHERE name LIKE \'{name.lower()}\''
-            self._cur = self._con.cursor().execute(sql)
-            return self._return(return_type, sel.split(','))
+            sql, params = _build.where_like({'name': name})
+            sql = f'SELECT {sel} FROM {table_name}' + sql
+            rows = self._execute(sql, params)
+            return self._return(rows, return_type, sel.split(','))
 
         setattr(self, func_name, _table)
 
@@ -313,13 +726,31 @@ class Database:
         for k, v in x.items():
             if isinstance(v, (int, str)):
                 v = [v]
-            exist = getattr(Database, f'exist_{k}')
             for i in v:
-                if i != '' and not exist(self, i):
+                if i != '' and len(self.catalog.match(k, i)) == 0:
                     raise ValueError(f"{k}: '{i}' does not exist.")
 
-    def _build_query(self, qa):
-        """Build query."""
+    def _build_query(self, qa, stats=None):
+        """
+        Build query.
+
+        Return:
+            A tuple of (sql, parameters), selected column names and
+            query arguments.
+        """
+        where_ids, select, args = self._resolve_query(qa, stats)
+        return (self._source_query(where_ids),
+                select.split(','),
+                args)
+
+    def _resolve_query(self, qa, stats=None):
+        """
+        Resolve query arguments to ids of data table.
+
+        Return:
+            A tuple of a dict of param, sta and date ids, select string and
+            query arguments.
+        """
         # args = ()
         # kwargs = {'pol': 'pm10', 'city': 'adana', 'sta': 'çatalan',
         #           'date': ['>=2015-01-01', '<=2019-01-01'], 'month': 3}
@@ -333,196 +764,630 @@ class Database:
             Return (dict):
                 A dict of query results
             """
-
-            def _end_points_(date_ids):
-                """Return end points of consecutive integers."""
-                diff_date_ids = [date_ids[i] - date_ids[i - 1] for i in
-                                 range(1, len(date_ids))]
-                endpi = [i for i, v in enumerate(diff_date_ids) if v != 1]
-                endpi = [-1] + endpi + [len(date_ids) - 1]
-                endpi = [[endpi[i - 1] + 1, endpi[i]]
-                         for i in range(1, len(endpi))]
-                endp = [[date_ids[i[0]], date_ids[i[1]]] for i in endpi]
-                return endp
-
-            def _get_ids_(where, table):
-                with _closing(self._con.cursor()) as cur:
-                    sql = _build.select('id', where, table)
-                    x = cur.execute(sql).fetchall()
-                if len(x) > 0:
-                    x = [i[0] for i in x]
-                return x
-
-            param_ids = _get_ids_({'name': opt_queries['param']}, 'param')
-            reg_ids = _get_ids_({'name': opt_queries['reg']}, 'reg')
-            city_ids = _get_ids_({'name': opt_queries['city'], 'reg': reg_ids},
-                                 'city')
-            sta_ids = _get_ids_({'name': opt_queries['sta'], 'city': city_ids},
-                                'sta')
-            date_ids = _get_ids_({k: opt_queries[k] for k in
-                                  Database._keys_date}, 'cal')
-            if len(date_ids) == 0:
-                date_ids = []
+            cat = self.catalog
+            param_ids = cat.ids('param', opt_queries['param'])
+            reg_ids = cat.ids('reg', opt_queries['reg'])
+            city_ids = cat.ids('city', opt_queries['city'], reg_ids)
+            sta_ids = cat.ids('sta', opt_queries['sta'], city_ids)
+            date_ids = self._calendar()['id'][self._date_index(opt_queries)]
+            if len(date_ids) > 1:
+                date_ids = date_ids[date_ids <= self._max_date()]
+                date_ids = _utils.end_points(date_ids) \
+                    if len(date_ids) > 0 else []
             else:
-                if len(date_ids) > 1:
-                    with _closing(self._con.cursor()) as cur:
-                        ret = cur.execute('SELECT MAX(date) FROM data')
-                        max_date = ret.fetchone()[0]
-                    date_ids = [i for i in date_ids if i <= max_date]
-                    date_ids = _end_points_(date_ids)
+                date_ids = date_ids.tolist()
+            if len(date_ids) == 0:
+                # an empty range, nothing matches date queries
+                date_ids = [[1, 0]]
 
             # create query for dat table
             where = {'param': param_ids, 'sta': sta_ids, 'date': date_ids}
             return where
 
-        select = _build.main_select_string(qa.select)
+        with _timer(stats, 'validate'):
+            select = _build.main_select_string(qa.select)
+            args = qa.to_dict(all_args=True)
+            self._check_opt_queries(args)
+        with _timer(stats, 'resolve'):
+            where_ids = _get_ids_for_tables(args)
+        return where_ids, select, args
 
-        args = qa.to_dict(all_args=True)
+    @staticmethod
+    def _data_query(where_ids):
+        """
+        Build main query on data table.
 
-        self._check_opt_queries(args)
-        where_ids = _get_ids_for_tables(args)
-        select_data = _build.select('*', where_ids, 'data')
-        sql = """
-            SELECT
-                {select}
-            FROM
-            (SELECT
-                param.name AS param,
-                reg.name AS reg,
-                city.name AS city_ascii,
-                city.nametr AS city,
-                sta.name AS sta_ascii,
-                sta.nametr AS sta,
-                sta.lat AS lat,
-                sta.lon AS lon,
-                cal.date AS date,
-                cal.year AS year,
-                cal.month AS month,
-                cal.day AS day,
-                cal.hour AS hour,
-                cal.week AS week,
-                cal.doy AS doy,
-                cal.hoy AS hoy,
-                cast(data.value AS float) AS value
-            FROM
-                ({data}) data
-            INNER JOIN param ON param.id = data.param
-            INNER JOIN reg ON reg.id = city.reg
-            INNER JOIN city ON city.id = sta.city
-            INNER JOIN sta ON sta.id = data.sta
-            INNER JOIN cal ON cal.id = data.date);"""
-        return (sql.format(select=select, data=select_data),
-                select.split(','),
-                args)
+        Only ids and values are read. Names and coordinates are taken from
+        the catalog and date columns from the calendar by ids, so labels
+        are not joined to each row.
 
-    def _generator(  # pylint: disable=R0914,R0915
-        self,
-        query,
-        sel,
-        opt_queries,
-        include_nan=True
-    ):
-        """Query result generator."""
+        Args:
+            where_ids (dict): param, sta and date ids
+        Return:
+            A tuple of sql statement, its parameters and temporary tables.
+        """
+        temp, tables = Database._temp_tables(where_ids)
+        sql, params = _build.select(
+            'param, sta, date, cast(value AS float)', where_ids, 'data', temp)
+        return sql + ' ORDER BY param, sta, date', params, tables
 
-        def get_cal_table(opt_queries):
-            where = {k: opt_queries[k] for k in Database._keys_date}
-            sql = _build.select('*', where, 'cal')
-            if len(sql) == 0:
-                sql = 'SELECT * FROM cal'
-            with _closing(self._con.cursor()) as cur:
-                x = cur.execute(sql).fetchall()
-            return x
+    @staticmethod
+    def _temp_tables(where_ids):
+        """
+        Get temporary tables of large id sets of where_ids.
 
-        def replace_list(r, cal_row, sel):
-            for s in sel:
-                if s in Database._keys_date:
-                    i = sel.index(s)
-                    j = Database._keys_date.index(s) + 1
-                    r[i] = cal_row[j]
-            if 'value' in sel:
-                r[sel.index('value')] = float('NaN')
-            return r
-
-        def create_nan(cur_date_index, last_row, sel, cal):
-            cur_date_index += 1
-            while cur_date_index < len(cal):
-                cal_row = cal[cur_date_index]
-                yield replace_list(list(last_row), cal_row, sel)
-                cur_date_index += 1
-            cur_date_index = -1
-            return cur_date_index
-
-        def get_sel_indices(sel):
-            _sel_keys_ = ['param', 'sta', 'date', 'value']
-            index = dict(zip(_sel_keys_,
-                             [sel.index(i) if i in sel else -1
-                              for i in _sel_keys_]))
-            for k, v in index.items():
-                if v < 0:
-                    raise Exception(k + ' cannot be found')
-            return index
-
-        cal = get_cal_table(opt_queries)
-        index = get_sel_indices(sel)
-        cur = self._con.cursor().execute(query)
-
-        prev_param = ''
-        prev_sta = ''
-        last_row = None
-        cur_date_index = -1
-        while True:
-            rows = cur.fetchmany()
-            if not rows:
+        Large IN lists and sets of date ranges are planned poorly and make
+        long statements, so they are joined from temporary tables of the
+        connection instead. Temporary tables cannot be created if
+        options.query_only is set.
+        """
+        threshold = None if options.query_only else \
+            options.temp_table_threshold
+        return _build.temp_tables(where_ids, threshold)
+
+    @staticmethod
+    @_contextmanager
+    def _with_temp_tables(con, query):
+        """
+        Create temporary tables of a query until the with block exits.
+
+        Tables are created and dropped in their own transactions, so no
+        transaction is kept open while rows are fetched. A table cannot be
+        dropped while another query is read on the same connection, so it
+        is emptied instead and dropped by a later query.
+        """
+        tables = query[2] if len(query) > 2 else {}
+        if len(tables) == 0:
+            yield
+            return
+        stale = con.execute(
+            "SELECT name FROM temp.sqlite_master WHERE type = 'table' AND "
+            "name LIKE 'airdb!_%' ESCAPE '!'").fetchall()
+        for name, in stale:
+            try:
+                con.execute(f'DROP TABLE temp.{name}')
+            except _sqlite3.OperationalError:
                 break
-            for r in rows:
-                if include_nan:
-                    cur_pol = r[index['param']]  # current parameter
-                    cur_sta = r[index['sta']]  # current station
-
-                    if prev_param != cur_pol and cur_date_index > -1:
-                        for i in create_nan(cur_date_index,
-                                            last_row, sel, cal):
-                            yield i
-                        cur_date_index = -1
-
-                    if prev_sta != cur_sta and cur_date_index > -1:
-                        for i in create_nan(cur_date_index,
-                                            last_row, sel, cal):
-                            yield i
-                        cur_date_index = -1
-
-                    prev_param = cur_pol
-                    prev_sta = cur_sta
-                    cur_date_index += 1  # current date index
-                    cur_date = cal[cur_date_index][1]
-                    row_date = r[index['date']]
-
-                    while cur_date < row_date:
-                        yield replace_list(list(r), cal[cur_date_index], sel)
-                        cur_date_index += 1
-                        cur_date = cal[cur_date_index][1]
-                last_row = list(r)
-                yield last_row
-        if include_nan and last_row is not None:
-            for i in create_nan(cur_date_index, last_row, sel, cal):
-                yield i
-        cur.close()
-
-    def _query_data(self, qa, as_list=False, include_nan=True):
-        """Query database."""
+        for name, ids in tables.items():
+            con.execute(f'CREATE TEMP TABLE {name} (id INTEGER PRIMARY KEY)')
+            con.executemany(f'INSERT INTO temp.{name} VALUES (?)',
+                            ((i,) for i in ids))
+        con.commit()
+        try:
+            yield
+        finally:
+            for name in tables:
+                try:
+                    con.execute(f'DROP TABLE IF EXISTS temp.{name}')
+                except _sqlite3.OperationalError:
+                    con.execute(f'DELETE FROM temp.{name}')
+            con.commit()
+
+    def _source_query(self, where_ids):
+        """
+        Build query of data for query engine.
+
+        For parquet engine, query is a tuple of description of mirror
+        query and where_ids.
+        """
+        if self._mirror is None:
+            return Database._data_query(where_ids)
+        return self._mirror.describe(*self._mirror_args(where_ids)), \
+            where_ids
+
+    def _mirror_args(self, where_ids):
+        """
+        Get param ids, sta ids, date ranges and years to read from mirror.
+
+        Empty param, sta and date lists match all rows as in data query.
+        """
+        params = where_ids['param'] or self._mirror.params()
+        ranges = [r if isinstance(r, list) else [r, r]
+                  for r in where_ids['date']]
+        cal = self._calendar()
+        years = set()
+        for lo, hi in ranges:
+            if lo <= hi:
+                i = _np.searchsorted(cal['id'], [lo, hi])
+                i = _np.clip(i, 0, len(cal['id']) - 1)
+                years.update(range(cal['year'][i[0]], cal['year'][i[1]] + 1))
+        if len(ranges) > 0 and len(years) == 0:
+            # only empty date ranges, nothing matches
+            params = []
+        return params, where_ids['sta'], ranges, sorted(years)
+
+    def _id_batches(self, p, sta, date, value, sel, cal, include_nan=True,
+                    stats=None):
+        """
+        Column batches of rows of a param given by id arrays.
+
+        sta, date and value arrays are sorted by sta and date. Coordinates
+        are taken from catalog by ids and names are pandas.Categorical
+        columns on codes of catalog labels.
+        """
+        tables = self.catalog.tables
+        codes = self._labels()
+
+        def labels(p, sta):
+            """Get label codes and coordinates of param p and sta ids."""
+            s = _np.searchsorted(tables['sta']['id'], sta)
+            c = _np.searchsorted(tables['city']['id'],
+                                 tables['sta']['city'][s])
+            r = _np.searchsorted(tables['reg']['id'],
+                                 tables['city']['reg'][c])
+            i = _np.searchsorted(tables['param']['id'], p)
+            return {'param': _np.full(len(s), codes['param'][0][i]),
+                    'reg': codes['reg'][0][r],
+                    'city': codes['city'][0][c],
+                    'sta': codes['sta'][0][s],
+                    'lat': tables['sta']['lat'][s],
+                    'lon': tables['sta']['lon'][s]}
+
+        def column(k, x):
+            """Categorical column of label codes."""
+            if k in codes:
+                return _pd.Categorical.from_codes(x, dtype=codes[k][1])
+            return x
+
+        if include_nan:
+            n = len(cal['id'])
+            bounds = _np.flatnonzero(_np.diff(sta)) + 1
+            for s, d, v in zip(_np.split(sta, bounds),
+                               _np.split(date, bounds),
+                               _np.split(value, bounds)):
+                if len(s) == 0:
+                    continue
+                with _timer(stats, 'fill'):
+                    values = _np.full(n, _np.nan)
+                    values[_np.searchsorted(cal['id'], d)] = v
+                    lab = labels(p, s[:1])
+                    cols = [values if k == 'value' else cal[k]
+                            if k in Database._keys_date else
+                            column(k, _np.full(n, lab[k][0]))
+                            for k in sel]
+                if stats is not None:
+                    stats.rows_nan += n - len(s)
+                yield cols
+        else:
+            for j in range(0, len(sta), 10000):
+                s, d = sta[j:j + 10000], date[j:j + 10000]
+                with _timer(stats, 'fill'):
+                    lab = labels(p, s)
+                    i = _np.searchsorted(cal['id'], d)
+                    cols = [value[j:j + 10000] if k == 'value' else
+                            cal[k][i] if k in Database._keys_date else
+                            column(k, lab[k]) for k in sel]
+                yield cols
+
+    def _calendar(self):
+        """
+        Get calendar table.
+
+        Calendar table is read once per connection and kept as a dict of
+        typed numpy arrays keyed by 'id' and date keys.
+        """
+        with self._lock:
+            if self._cal is None:
+                self._load_calendar()
+            return self._cal
+
+    def _load_calendar(self):
+        """Read calendar table into typed numpy arrays."""
+        sql = 'SELECT id, CAST(date AS TEXT),' + \
+            ','.join(Database._keys_date[1:]) + ' FROM cal ORDER BY id'
+        cols = list(zip(*self._execute(sql)))
+        if len(cols) == 0:
+            cols = [()] * (len(Database._keys_date) + 1)
+        text = _np.empty(len(cols[1]), dtype=object)
+        text[:] = cols[1]
+        cal = {'id': _np.array(cols[0], dtype=_np.int64),
+               'date': _pd.to_datetime(text).values.astype('datetime64[us]')}
+        for k, v in zip(Database._keys_date[1:], cols[2:]):
+            cal[k] = _np.array(v, dtype=_np.int64)
+        self._cal = cal
+        self._cal_text = text
+
+    def _date_index(self, opt_queries):
+        """
+        Get calendar positions matching date queries.
+
+        Date queries are evaluated on the cached calendar. Comparisons on
+        date are resolved by binary search on the stored date strings.
+        """
+        with self._lock:
+            cal = self._calendar()
+            text = self._cal_text
+        where = {k: opt_queries[k] for k in Database._keys_date}
+        cols = dict(cal, date=text)
+        mask = _utils.where_mask(cols, where, sorted_cols=('date',))
+        return _np.flatnonzero(mask)
+
+    def _max_date(self):
+        """Maximum date id in data table, cached per connection."""
+        with self._lock:
+            if self._data_max_date is None:
+                x = self._execute('SELECT MAX(date) FROM data')[0][0]
+                # an empty data table has no valid date ids
+                self._data_max_date = -1 if x is None else x
+            return self._data_max_date
+
+    def _batches(self, query, sel, opt_queries, include_nan=True,
+                 stats=None):
+        """
+        Query result generator of column batches.
+
+        query is a query of _source_query. Each batch is a list of columns
+        in the order of sel. Date columns are taken from the calendar and
+        names and coordinates from the catalog by the ids returned by the
+        query. If include_nan is True, each batch is a whole (param, sta)
+        series reindexed on the calendar where missing values are NaN.
+        Times and row counts are added to stats if given.
+
+        Rows are ordered by param, sta and date rather than in the order of
+        the query planner. Series are reindexed only on dates matching date
+        queries, so no rows are returned if no date matches, even if
+        include_nan is True.
+        """
+
+        def get_cal_table(opt_queries):
+            """Get calendar rows matching date queries as numpy arrays."""
+            i = self._date_index(opt_queries)
+            return {k: v[i] for k, v in self._calendar().items()}
+
+        for k in ('param', 'sta', 'date', 'value'):
+            if k not in sel:
+                raise Exception(k + ' cannot be found')
+        with _timer(stats, 'resolve'):
+            cal = get_cal_table(opt_queries) if include_nan else \
+                self._calendar()
+            # catalog is read before the connection is held by the scan
+            self._labels()
+        pending = None
+        for rows in self._scan_batches(query, stats):
+            if pending is not None:
+                rows = tuple(_np.concatenate(c) for c in zip(pending, rows))
+                pending = None
+            if include_nan and self._mirror is None:
+                # the last series can continue in the next fetched batch
+                p, s = rows[0], rows[1]
+                j = _np.flatnonzero((p != p[-1]) | (s != s[-1]))
+                j = j[-1] + 1 if len(j) > 0 else 0
+                pending = tuple(c[j:] for c in rows)
+                rows = tuple(c[:j] for c in rows)
+            yield from self._split_batches(rows, sel, cal, include_nan, stats)
+        if pending is not None:
+            yield from self._split_batches(pending, sel, cal, include_nan,
+                                           stats)
+
+    def _generator(self, query, sel, opt_queries, include_nan=True,
+                   stats=None):
+        """Query result generator."""
+        return Database._rows(
+            self._batches(query, sel, opt_queries, include_nan, stats), stats)
+
+    def _long_list(self, query, sel, opt_queries, include_nan=True,
+                   stats=None):
+        """Query result as a list of columns."""
+        return Database._long_columns(
+            self._batches(query, sel, opt_queries, include_nan, stats), sel,
+            stats)
+
+    @staticmethod
+    def _rows(batches, stats=None):
+        """Generator of rows of column batches."""
+        for cols in batches:
+            with _timer(stats, 'convert'):
+                rows = list(map(list, zip(*(_utils.tolist(c)
+                                            for c in cols))))
+            if stats is not None:
+                stats.rows += len(rows)
+            yield from rows
+
+    @staticmethod
+    def _long_columns(batches, sel, stats=None):
+        """Concatenate column batches to a list of columns."""
+        ret = [[] for _ in sel]
+        for cols in batches:
+            with _timer(stats, 'convert'):
+                for r, c in zip(ret, cols):
+                    r.extend(_utils.tolist(c))
+        return ret
+
+    def _chunks(self, query, sel, opt_queries, chunksize, return_type='df',
+                include_nan=True, stats=None):
+        """
+        Query result generator of bounded size chunks.
+
+        Batches are re-chunked after NaN filling, so that gaps are filled
+        correctly across chunk boundaries.
+        """
+        batches = self._batches(query, sel, opt_queries, include_nan, stats)
+        for chunk in _utils.rechunk(batches, chunksize):
+            with _timer(stats, 'convert'):
+                cols = _utils.to_columns(chunk, sel, Database._dtypes,
+                                         size=chunksize,
+                                         categories=self._categories())
+                if return_type == 'df':
+                    cols = _utils.to_frame(cols)
+                elif return_type == 'arrow':
+                    cols = _utils.to_arrow(cols, batch=True)
+            if stats is not None:
+                stats.rows += sum(len(c[0]) for c in chunk)
+                stats.nbytes += _sizeof(cols)
+            yield cols
+
+    def _query_data(self, qa, return_type='gen', include_nan=True,
+                    stats=None):
+        """
+        Query database.
+
+        Args:
+            qa (DatabaseQueryArguments): Query arguments
+            return_type (str): One of gen, list, long_list or numpy
+            include_nan (bool): Include NaN in results?
+            stats (QueryStats): Statistics of query to update
+        """
         # args = ()
         # kwargs = {'pol': 'pm10', 'city': 'adana', 'sta': 'çatalan',
         #           'date': ['>=2015-01-01', '<=2019-01-01'], 'month': 3}
-        query, sel, opt_queries = self._build_query(qa)
-        ret = self._generator(query, sel, opt_queries, include_nan)
-        if as_list:
-            ret = list(ret)
+        query, sel, opt_queries = self._build_query(qa, stats)
+        if return_type == 'numpy':
+            with _timer(stats, 'convert'):
+                ret = _utils.to_columns(
+                    self._batches(query, sel, opt_queries, include_nan,
+                                  stats),
+                    sel, Database._dtypes, categories=self._categories())
+        elif return_type == 'long_list':
+            ret = self._long_list(query, sel, opt_queries, include_nan,
+                                  stats)
+        else:
+            ret = self._generator(query, sel, opt_queries, include_nan,
+                                  stats)
+            if return_type == 'list':
+                ret = list(ret)
         return ret, sel, query
 
+    def _get_processes(self, workers):
+        """Process pool of parallel queries, created on first use."""
+        with self._lock:
+            if self._processes is not None and \
+                    self._processes[0] != workers:
+                self._processes[1].shutdown(wait=False)
+                self._processes = None
+            if self._processes is None:
+                # spawn does not inherit open sqlite connections
+                self._processes = (workers, _ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_multiprocessing.get_context('spawn')))
+            return self._processes[1]
+
+    def _query_parallel(self, qa, workers, include_nan=True, stats=None):
+        """
+        Query database in a process pool.
+
+        Query is split into about 4 * workers partitions by param and sta
+        ids. Each partition is executed by a worker process on its own
+        read-only connection and columnar results are concatenated in
+        order of partitions, which is the order of the serial query.
+
+        Args:
+            qa (DatabaseQueryArguments): Query arguments
+            workers (int): Number of worker processes
+            include_nan (bool): Include NaN in results?
+            stats (QueryStats): Statistics of query to update. Waiting
+                                for partitions is timed as fetch.
+        """
+        where_ids, select, args = self._resolve_query(qa, stats)
+        sel = select.split(',')
+        query = Database._data_query(where_ids)
+        if len(where_ids['param']) == 0 or len(where_ids['sta']) == 0:
+            with _timer(stats, 'convert'):
+                return _utils.to_columns(
+                    self._batches(query, sel, args, include_nan, stats),
+                    sel, Database._dtypes,
+                    categories=self._categories()), sel, query
+        ex = self._get_processes(workers)
+        # spawned workers do not inherit options of this process
+        snapshot = options.snapshot()
+        futures = [
+            ex.submit(_query_partition, snapshot, self._name,
+                      Database._data_query(dict(where_ids, param=p, sta=s)),
+                      sel, args, include_nan)
+            for p, s in _utils.partition_ids(where_ids['param'],
+                                             where_ids['sta'], 4 * workers)]
+        parts = []
+        with _timer(stats, 'fetch'):
+            for f in futures:
+                cols, part_stats = f.result()
+                parts.append(cols)
+                if stats is not None:
+                    stats.merge(part_stats)
+        with _timer(stats, 'convert'):
+            return _utils.concat_columns(parts), sel, query
+
+    def _query_lazy(self, qa, param_to_variable=False, sta_chunk=10,
+                    stats=None):
+        """
+        Query database as a lazy dask-backed xarray object.
+
+        Coordinates are taken from catalog, measurement table and calendar
+        without reading data table. Data is a dask array chunked by param,
+        blocks of sta_chunk stations and year, and each chunk runs its own
+        narrowed query when it is computed. Requires dask.
+
+        Args:
+            qa (DatabaseQueryArguments): Query arguments
+            param_to_variable (bool): Return a Dataset where each parameter
+                                      is a variable.
+            sta_chunk (int): Number of stations in a chunk
+            stats (QueryStats): Statistics of query to update
+        """
+        import dask.array as da  # pylint: disable=C0415
+
+        where_ids, select, args = self._resolve_query(qa, stats)
+        sel = select.split(',')
+        if any(k in Database._keys_date[1:] for k in sel):
+            raise ValueError('Date parts cannot be selected for xarray_lazy '
+                             'return type')
+        dims = [k for k in sel if k in ('param', 'reg', 'city', 'sta')]
+        tables = self.catalog.tables
+        with _timer(stats, 'resolve'):
+            pairs, labels, si = self._measured_series(where_ids)
+            codes, coords = {}, {}
+            for d in dims:
+                coords[d], codes[d] = _np.unique(labels[d].astype(str),
+                                                 return_inverse=True)
+                coords[d] = coords[d].astype(object)
+            cal = self._calendar()
+            i = self._date_index(args)
+            date_ids = cal['id'][i]
+            coords['date'] = cal['date'][i].astype('datetime64[ns]')
+        if len(si) == 0 or len(date_ids) == 0:
+            return _xr.DataArray([], dims=['date'])
+
+        def block(block_info=None):
+            """Query a chunk of data cube."""
+            info = block_info[None]
+            loc = dict(zip(dims + ['date'], info['array-location']))
+            data = _np.full(info['chunk-shape'], _np.nan)
+            in_block = _np.ones(len(pairs['sta']), dtype=bool)
+            for d in dims:
+                in_block &= (codes[d] >= loc[d][0]) & (codes[d] < loc[d][1])
+            d0, d1 = loc['date']
+            if not in_block.any():
+                return data
+            where = {k: _np.unique(v[in_block]).tolist()
+                     for k, v in pairs.items()}
+            where['date'] = _utils.end_points(date_ids[d0:d1])
+            cols = _utils.to_columns(
+                self._batches(self._source_query(where), sel, args,
+                              include_nan=False),
+                sel, Database._dtypes, categories=self._categories())
+            index = [_np.searchsorted(coords[d], cols.decode(d)) - loc[d][0]
+                     for d in dims]
+            index.append(_np.searchsorted(coords['date'][d0:d1],
+                                          cols['date']))
+            data[tuple(index)] = cols['value']
+            return data
+
+        chunks = []
+        for d in dims:
+            n = len(coords[d])
+            chunks.append((1,) * n if d == 'param' else
+                          tuple(min(sta_chunk, n - j)
+                                for j in range(0, n, sta_chunk))
+                          if d == 'sta' else (n,))
+        _, counts = _np.unique(cal['year'][i], return_counts=True)
+        chunks.append(tuple(counts.tolist()))
+        data = da.map_blocks(block, chunks=tuple(chunks), dtype=float,
+                             meta=_np.array((), dtype=float))
+
+        has_measurement = _np.zeros([len(coords[d]) for d in dims],
+                                    dtype=bool)
+        has_measurement[tuple(codes[d] for d in dims)] = True
+        # first pair of each station
+        _, first = _np.unique(codes['sta'], return_index=True)
+        for k in ('lat', 'lon'):
+            if k in sel:
+                coords[k] = ('sta', tables['sta'][k][si[first]])
+        if 'city' in dims:
+            city = coords['city'][codes['city'][first]]
+            coords['sta_long'] = ('sta', _np.array(
+                [" - ".join([c.title(), s.title()])
+                 for c, s in zip(city, coords['sta'])], dtype=object))
+        # coords of chunks are kept by block
+        return _utils.build_xarray(data, dims + ['date'], dict(coords),
+                                   has_measurement, self.name,
+                                   param_to_variable)
+
+    def _measured_series(self, where_ids):
+        """
+        Get measured (param, sta) pairs matching where_ids.
+
+        Pairs are taken from measurement table in catalog. Empty param or
+        sta ids match all.
+
+        Return (tuple):
+            A dict of param and sta id arrays, a dict of param, reg, city
+            and sta label arrays of pairs and positions of stations of
+            pairs in sta table.
+        """
+        tables = self.catalog.tables
+        m = tables['measurement']
+        mask = _np.ones(len(m['param']), dtype=bool)
+        for k in ('param', 'sta'):
+            if len(where_ids[k]) > 0:
+                mask &= _np.isin(m[k], where_ids[k])
+        i = _np.lexsort((m['sta'][mask], m['param'][mask]))
+        pairs = {'param': m['param'][mask][i], 'sta': m['sta'][mask][i]}
+        si = _np.searchsorted(tables['sta']['id'], pairs['sta'])
+        ci = _np.searchsorted(tables['city']['id'],
+                              tables['sta']['city'][si])
+        ri = _np.searchsorted(tables['reg']['id'],
+                              tables['city']['reg'][ci])
+        pi = _np.searchsorted(tables['param']['id'], pairs['param'])
+        labels = {'param': tables['param']['name'][pi],
+                  'reg': tables['reg']['name'][ri],
+                  'city': tables['city']['nametr'][ci],
+                  'sta': tables['sta']['nametr'][si]}
+        return pairs, labels, si
+
+    def _query_wide(self, qa, stats=None):
+        """
+        Query database as a wide DataFrame of dates by series.
+
+        Matrix of values is allocated from calendar rows matching date
+        queries and measured (param, sta) pairs and values are scattered
+        into it while rows are fetched, so long rows are never pivoted.
+        Series without values in queried dates are all NaN.
+
+        Args:
+            qa (DatabaseQueryArguments): Query arguments
+            stats (QueryStats): Statistics of query to update
+        Return (tuple):
+            DataFrame with a date index and param, sta columns and query
+            of _scan_query
+        """
+        where_ids, _, args = self._resolve_query(qa, stats)
+        with _timer(stats, 'resolve'):
+            pairs, labels, _ = self._measured_series(where_ids)
+            cal = self._calendar()
+            i = self._date_index(args)
+            date_ids = cal['id'][i]
+            # (param, sta) of a pair as a single sortable key
+            n_sta = int(pairs['sta'].max()) + 1 if len(pairs['sta']) > 0 \
+                else 1
+            keys = pairs['param'] * n_sta + pairs['sta']
+        with _timer(stats, 'fill'):
+            # columns are rows of block, so the frame does not copy it
+            block = _np.full((len(keys), len(date_ids)), _np.nan)
+        where = dict(where_ids, param=_np.unique(pairs['param']).tolist(),
+                     sta=_np.unique(pairs['sta']).tolist())
+        query = self._scan_query([where] if block.size > 0 else [])
+        n = 0
+        for p, sta, date, value in self._scan_batches(query, stats):
+            with _timer(stats, 'fill'):
+                j = _np.searchsorted(keys, p * n_sta + sta)
+                k = _np.searchsorted(date_ids, date)
+                ok = (j < len(keys)) & (k < len(date_ids))
+                ok[ok] = (keys[j[ok]] == p[ok] * n_sta + sta[ok]) & \
+                    (date_ids[k[ok]] == date[ok])
+                block[j[ok], k[ok]] = value[ok]
+                n += int(ok.sum())
+        with _timer(stats, 'convert'):
+            columns = _pd.MultiIndex.from_arrays(
+                [labels['param'], labels['sta']], names=['param', 'sta'])
+            index = _pd.DatetimeIndex(cal['date'][i], name='date')
+            ret = _pd.DataFrame(block.T, index=index, columns=columns,
+                                copy=False)
+        if stats is not None:
+            stats.rows_nan += block.size - n
+        return ret, query
+
     def _query(self, *args, **kwargs):
         """Query database (Internal)."""
         data, _, _ = self._query_data(
-            args, kwargs, include_nan=False)
+            DatabaseQueryArguments(*args, **kwargs), include_nan=False)
         return data
 
     # %%--------
@@ -536,8 +1401,7 @@ class Database:
             city    (str) : City to search in database
             station (str) : Station to search in database
         """
-        return len(self.measured(param, city, station,
-                   return_type='list')) > 0
+        return len(self.catalog.measured(param, city, station)) > 0
 
     def exist_param(self, name):
         """
@@ -548,7 +1412,7 @@ class Database:
         Return:
             True/False
         """
-        return len(self.param(name, return_type='list')) > 0
+        return len(self.catalog.match('param', name)) > 0
 
     def exist_reg(self, name):
         """
@@ -559,7 +1423,7 @@ class Database:
         Return:
             True/False
         """
-        return len(self.reg(name, return_type='list')) > 0
+        return len(self.catalog.match('reg', name)) > 0
 
     def exist_city(self, name, region=''):
         """
@@ -572,7 +1436,7 @@ class Database:
         Return:
             True/False
         """
-        return len(self.city(name, region, return_type='list')) > 0
+        return len(self.catalog.match('city', name, region=region)) > 0
 
     def exist_sta(self, name, city='', region=''):
         """
@@ -585,7 +1449,7 @@ class Database:
         Return:
             True/False
         """
-        return len(self.sta(name, city, region, return_type='list')) > 0
+        return len(self.catalog.match('sta', name, city, region)) > 0
 
     def query(self, *args, **kwargs):
         """
@@ -607,41 +1471,465 @@ class Database:
         --
             include_nan (bool): Include NaN in results?
             verbose     (bool): Detailed output
+            explain     (bool): Print query plan to find full table scans.
+                                Query plan is also printed if verbose.
+            return_type (str) : Overrides return_type of Database object.
+                                Names of df are pandas.Categorical
+                                columns. arrow returns a pyarrow.Table with
+                                dictionary-encoded names and a timestamp
+                                date column. xarray_lazy returns a
+                                dask-backed xarray object whose chunks
+                                are queried when computed. wide returns
+                                a DataFrame of dates by (param, sta)
+                                columns of measured series. Dates
+                                without values are NaN rows and select
+                                is not supported for wide.
+            sta_chunk   (int) : Number of stations in a chunk of
+                                xarray_lazy return type. Default is 10.
+            workers     (int) : Number of worker processes. If greater
+                                than 1, query is split into param/station
+                                partitions and executed in a process pool.
+                                Only for df, numpy, xarray and arrow return
+                                types.
+            chunksize   (int) : If given, return a generator of DataFrames
+                                (Columns for numpy and pyarrow.RecordBatch
+                                for arrow return type) of at most chunksize
+                                rows. Only for df, numpy and arrow return
+                                types.
+
+        Timing and row counts of query are recorded in a QueryStats object
+        which is available as last_stats and passed to stats_callback.
         """
-
-        qa = DatabaseQueryArguments(*args, **kwargs)
+        stats = _QueryStats(self._return_type)
+        self._local.stats = stats
+        with stats.timer('validate'):
+            self._check_stamp()
+            qa = DatabaseQueryArguments(*args, **kwargs)
         args = _utils.get_args(
-            {}, qa.rest, {'include_nan': True, 'verbose': False})
+            {}, qa.rest, {'include_nan': True, 'verbose': False,
+                          'explain': False, 'return_type': self._return_type,
+                          'param_to_variable': False, 'workers': 1,
+                          'chunksize': None, 'sta_chunk': 10})
 
         include_nan = args.pop('include_nan')
         verbose = args.pop('verbose')
+        explain = args.pop('explain')
+        return_type = args.pop('return_type')
+        param_to_variable = args.pop('param_to_variable')
+        workers = args.pop('workers')
+        chunksize = args.pop('chunksize')
+        sta_chunk = args.pop('sta_chunk')
+        Database._check_return_type(return_type)
+        stats.return_type = return_type
+        columnar = return_type in ('df', 'xarray', 'numpy', 'arrow')
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError('workers must be a positive integer')
+        if workers > 1 and not columnar:
+            raise ValueError('workers is only supported for df, numpy, '
+                             'xarray and arrow return types')
+        if workers > 1 and self._mirror is not None:
+            raise ValueError('workers is only supported for sqlite engine')
+        if return_type == 'wide' and (qa.select not in ('', []) or
+                                      not include_nan):
+            raise ValueError('select and include_nan=False are not supported '
+                             'for wide return type')
+        if chunksize is not None:
+            if not isinstance(chunksize, int) or chunksize < 1:
+                raise ValueError('chunksize must be a positive integer')
+            if return_type not in ('df', 'numpy', 'arrow') or workers > 1:
+                raise ValueError('chunksize is only supported for df, numpy '
+                                 'and arrow return types without workers')
+            query, sel, opt_queries = self._build_query(qa, stats)
+            self._print_query(query, verbose, explain)
+            return self._tracked(
+                self._chunks(query, sel, opt_queries, chunksize,
+                             return_type, include_nan, stats), stats)
+
+        if return_type == 'xarray_lazy':
+            if not isinstance(sta_chunk, int) or sta_chunk < 1:
+                raise ValueError('sta_chunk must be a positive integer')
+            ret = self._query_lazy(qa, param_to_variable, sta_chunk, stats)
+            # nothing is read from data table until ret is computed
+            self._report(stats)
+            return ret
+
+        key = None
+        if self._cache is not None and return_type != 'gen':
+            key = (qa.canonical(), return_type, include_nan,
+                   param_to_variable)
+            with self._lock:
+                ret = self._cache.get(key)
+            if ret is not None:
+                stats.cache_hit = True
+                self._report(stats, ret)
+                if verbose:
+                    print(f'Query cache hit in {stats.total:.3f} seconds.')
+                return ret
+
+        if workers > 1:
+            data, colnames, query = self._query_parallel(
+                qa, workers, include_nan=include_nan, stats=stats)
+        elif return_type == 'wide':
+            data, query = self._query_wide(qa, stats)
+            colnames = None
+        else:
+            data, colnames, query = self._query_data(
+                qa, return_type='numpy' if columnar else return_type,
+                include_nan=include_nan, stats=stats)
+
+        self._print_query(query, verbose, explain)
+        if return_type == 'gen':
+            return self._tracked(data, stats)
+        with stats.timer('convert'):
+            ret = self._convert(data, colnames, return_type,
+                                param_to_variable)
+        nbytes = None
+        if key is not None:
+            nbytes = _sizeof(ret)
+            with self._lock:
+                self._cache.put(key, ret, nbytes)
+
+        self._report(stats, ret, nbytes)
+        if verbose:
+            print(f'Query completed in {stats.total:.3f} seconds.')
+            print(stats)
+        return ret
 
-        t1 = _time()
-        data, colnames, query = self._query_data(
-            qa, as_list=self._return_type == 'list',
-            include_nan=include_nan)
+    def query_many(self, queries, **kwargs):
+        """
+        Run a batch of queries by a single scan of data table.
 
-        if verbose:
-            print(query)
-        ret = data
-        if self._return_type == 'long_list':
-            ret = list(map(list, zip(*data)))
-        elif self._return_type == 'df':
-            ret = _pd.DataFrame(data, columns=colnames)
-        elif self._return_type == 'xarray':
-            param_to_variable = False
-            if 'param_to_variable' in kwargs.keys():
-                param_to_variable = kwargs.pop('param_to_variable')
-            ret = list(map(list, zip(*data)))
-            ret = _utils.long_to_xarray(ret, colnames,
-                                        self.name, param_to_variable)
-
-        t2 = _time()
-        elapsed = t2 - t1
-        if verbose:
-            print(f'Query completed in {elapsed:.3f} seconds.')
+        Arguments of all queries are resolved together and rows of all
+        queries are read by one scan of data table. Rows are then split
+        into results of queries by their param, sta and date ids. Queries
+        which differ only in param or station read each row once.
+
+        Args:
+            queries (list): List of dicts of query arguments as in query
+                            or DatabaseQueryArguments objects
+        --
+            include_nan       (bool): Include NaN in results?
+            verbose           (bool): Detailed output
+            return_type       (str) : Return type of results. gen returns
+                                      generators of fetched rows.
+                                      xarray_lazy and wide are not
+                                      supported.
+            param_to_variable (bool): As in query for xarray return type
+        Return (list):
+            Results in order of queries
+
+        Statistics of the batch are available as last_stats.
+        """
+        args = _utils.get_args(
+            {}, kwargs, {'include_nan': True, 'verbose': False,
+                         'return_type': self._return_type,
+                         'param_to_variable': False})
+        include_nan = args['include_nan']
+        return_type = args['return_type']
+        param_to_variable = args['param_to_variable']
+        Database._check_return_type(return_type)
+        if return_type in ('xarray_lazy', 'wide'):
+            raise ValueError(f'{return_type} return type is not supported '
+                             'by query_many')
+        stats = _QueryStats(return_type)
+        self._local.stats = stats
+        with stats.timer('validate'):
+            self._check_stamp()
+            qas = [q if isinstance(q, DatabaseQueryArguments) else
+                   DatabaseQueryArguments(**q) for q in queries]
+        ret = [None] * len(qas)
+        keys = [None] * len(qas)
+        if self._cache is not None and return_type != 'gen':
+            keys = [(qa.canonical(), return_type, include_nan,
+                     param_to_variable) for qa in qas]
+            with self._lock:
+                ret = [self._cache.get(k) for k in keys]
+        todo = [i for i, r in enumerate(ret) if r is None]
+        stats.cache_hit = len(todo) == 0 and len(qas) > 0
+
+        resolved = {i: self._resolve_query(qas[i], stats) for i in todo}
+        where_ids = [w for w, _, _ in resolved.values()]
+        rows = self._scan(self._scan_query(where_ids), stats)
+        with _timer(stats, 'resolve'):
+            cal = self._calendar()
+        for i in todo:
+            where, select, opt_queries = resolved[i]
+            sel = select.split(',')
+            with _timer(stats, 'fill'):
+                m = _np.ones(len(rows['param']), dtype=bool)
+                for k in ('param', 'sta'):
+                    if len(where[k]) > 0:
+                        m &= _np.isin(rows[k], where[k])
+                if len(where['date']) > 0:
+                    m &= _utils.in_ranges(rows['date'], _utils.union_ranges(
+                        [r if isinstance(r, list) else [r, r]
+                         for r in where['date']]))
+                part = tuple(v[m] for v in rows.values())
+            c = {k: v[self._date_index(opt_queries)] for k, v in
+                 cal.items()} if include_nan else cal
+            batches = self._split_batches(part, sel, c, include_nan, stats)
+            if return_type in ('gen', 'list'):
+                r = list(Database._rows(batches, stats))
+                ret[i] = iter(r) if return_type == 'gen' else r
+            elif return_type == 'long_list':
+                ret[i] = Database._long_columns(batches, sel, stats)
+            else:
+                with stats.timer('convert'):
+                    data = _utils.to_columns(
+                        batches, sel, Database._dtypes,
+                        categories=self._categories())
+                    ret[i] = self._convert(data, sel, return_type,
+                                           param_to_variable)
+            if keys[i] is not None:
+                with self._lock:
+                    self._cache.put(keys[i], ret[i])
+
+        if return_type not in ('gen', 'list'):
+            stats.rows = sum(_nrows(r, return_type) for r in ret)
+        # results are walked only if size is passed to callback
+        deep = self._stats_callback is not None
+        stats.nbytes = sum(_sizeof(r, deep) for r in ret
+                           if return_type != 'gen')
+        stats.finish()
+        if self._stats_callback is not None:
+            self._stats_callback(stats)
+        if args['verbose']:
+            print(f'{len(qas)} queries completed in {stats.total:.3f} '
+                  'seconds.')
+            print(stats)
         return ret
 
+    def _split_batches(self, rows, sel, cal, include_nan=True, stats=None):
+        """
+        Column batches of rows split by param.
+
+        rows is a tuple of param, sta, date and value arrays sorted by
+        param, sta and date.
+        """
+        bounds = _np.flatnonzero(_np.diff(rows[0])) + 1
+        for p, s, d, v in zip(*(_np.split(c, bounds) for c in rows)):
+            if len(p) > 0:
+                yield from self._id_batches(p[0], s, d, v, sel, cal,
+                                            include_nan, stats)
+
+    def _scan(self, query, stats=None):
+        """
+        Read rows of a query of _scan_query.
+
+        Args:
+            query (tuple): Query of _scan_query
+            stats (QueryStats): Statistics of query to update
+        Return (dict):
+            param, sta, date and value arrays sorted by param, sta and date
+        """
+        keys = ('param', 'sta', 'date', 'value')
+        parts = list(self._scan_batches(query, stats))
+        if len(parts) == 0:
+            return {k: _np.empty(0, dtype=_np.float64 if k == 'value' else
+                                 _np.int64) for k in keys}
+        return dict(zip(keys, (_np.concatenate(c) for c in zip(*parts))))
+
+    def _scan_query(self, where_ids):
+        """
+        Build query of ids and values of rows matching any of where_ids.
+
+        Param, sta and date ids of where_ids are merged, so rows of other
+        combinations of merged ids may be read as well. For parquet
+        engine, query is a tuple of description of mirror query and merged
+        where_ids as in _source_query.
+
+        Args:
+            where_ids (list): List of dicts of param, sta and date ids
+        Return (tuple):
+            sql statement, its parameters and temporary tables
+        """
+        where = {}
+        for k in ('param', 'sta'):
+            ids = [w[k] for w in where_ids]
+            where[k] = [] if any(len(i) == 0 for i in ids) else \
+                sorted(set(_chain.from_iterable(ids)))
+        if any(len(w['date']) == 0 for w in where_ids):
+            where['date'] = []
+        else:
+            where['date'] = _utils.union_ranges(
+                [r if isinstance(r, list) else [r, r]
+                 for w in where_ids for r in w['date']]) or [[1, 0]]
+        if len(where_ids) == 0:
+            # nothing matches
+            where = {'param': [], 'sta': [], 'date': [[1, 0]]}
+        if self._mirror is not None:
+            return self._mirror.describe(*self._mirror_args(where)), where
+        return self._source_query(where)
+
+    def _scan_batches(self, query, stats=None):
+        """
+        Generator of batches of rows of a query of _scan_query.
+
+        Each batch is a tuple of param, sta, date and value arrays.
+        """
+        if isinstance(query[1], dict):
+            params, sta_ids, ranges, years = self._mirror_args(query[1])
+            for p in params:
+                with _timer(stats, 'fetch'):
+                    sta, date, value = self._mirror.read(p, sta_ids, ranges,
+                                                         years)
+                if stats is not None:
+                    stats.rows_fetched += len(sta)
+                yield (_np.full(len(sta), p, dtype=_np.int64), sta, date,
+                       value)
+            return
+        with self._connection() as con, \
+                Database._with_temp_tables(con, query), \
+                _closing(con.cursor()) as cur:
+            with _timer(stats, 'fetch'):
+                cur.execute(query[0], query[1])
+            cur.arraysize = 10000
+            while True:
+                with _timer(stats, 'fetch'):
+                    batch = cur.fetchmany()
+                if len(batch) == 0:
+                    break
+                if stats is not None:
+                    stats.rows_fetched += len(batch)
+                # rows are converted in one pass instead of per column, ids
+                # are exact in float64
+                try:
+                    a = _np.fromiter(_chain.from_iterable(batch), _np.float64,
+                                     count=4 * len(batch)).reshape(-1, 4)
+                except TypeError:
+                    # NULL values
+                    a = _np.array(batch, dtype=_np.float64)
+                yield tuple(a[:, i].astype(_np.int64) for i in range(3)) + \
+                    (a[:, 3].copy(),)
+
+    def _convert(self, data, colnames, return_type, param_to_variable=False):
+        """Convert columnar result to df, xarray or arrow return type."""
+        if return_type == 'df':
+            return _utils.to_frame(data)
+        if return_type == 'xarray':
+            return _utils.to_xarray(data, self.name, param_to_variable)
+        if return_type == 'arrow':
+            return _utils.to_arrow(data)
+        return data
+
+    def _report(self, stats, result=None, nbytes=None):
+        """
+        Finish statistics of a query and pass them to callback.
+
+        Size of result is only counted exactly if it is known or passed to
+        callback. Otherwise it is estimated without walking the result.
+        """
+        if result is not None and nbytes is None and \
+                self._stats_callback is not None:
+            nbytes = _sizeof(result)
+        stats.finish(result, nbytes)
+        if self._stats_callback is not None:
+            self._stats_callback(stats)
+
+    def _tracked(self, gen, stats):
+        """Report statistics of a lazy result when it is consumed."""
+        try:
+            yield from gen
+        finally:
+            self._report(stats)
+
+    def aggregate(self, *args, **kwargs):
+        """
+        Aggregate data in database by time periods.
+
+        Statistics are computed by sqlite grouping on calendar columns, so
+        only aggregated rows are returned. Each row has count of valid
+        (non-missing) hours and number of hours of the period in calendar
+        to apply completeness thresholds (count / hours).
+
+        Args:
+            param (str, list)      : parameter name
+            reg   (str, list)      : Region Name
+            city  (str, list)      : City Name
+            sta   (str, list)      : Station Name
+            date  (str, list)      : Date
+            year, month, day, hour, week, doy, hoy (str, list, int) :
+                                     Date filters as in query
+        --
+            freq        (str)      : One of 'D' (daily), 'M' (monthly),
+                                     'Y' (annual) or 'hour-of-day'.
+                                     Default is 'D'.
+            how         (str, list): Statistics. Any of 'mean', 'min',
+                                     'max', 'sum', 'count' or 'pNN' for
+                                     NNth percentile (e.g. 'p98').
+                                     Default is 'mean'.
+            verbose     (bool)     : Detailed output
+            explain     (bool)     : Print query plan
+            return_type (str)      : One of 'gen', 'list', 'long_list', ['df']
+        Return:
+            Aggregated data with param, reg, city, sta, period columns,
+            statistics, count and hours columns.
+        """
+        qa = DatabaseQueryArguments(*args, **kwargs)
+        args = _utils.get_args(
+            {}, qa.rest, {'freq': 'D', 'how': 'mean', 'verbose': False,
+                          'explain': False, 'return_type': 'df'})
+        freq = args.pop('freq')
+        if freq not in Database._freqs:
+            raise ValueError('freq must be one of ' +
+                             str(list(Database._freqs)))
+        keys = Database._freqs[freq]
+        how = _utils.split_str(args.pop('how'))
+        how = [how] if isinstance(how, str) else list(how)
+        # count of valid hours is always returned
+        how = [h for h in dict.fromkeys(how) if h != 'count']
+        stats = []
+        for h in how:
+            if h in Database._stats:
+                stats.append(f'{Database._stats[h]}(data.value) AS {h}')
+            elif h[:1] == 'p' and h[1:].isdigit() and int(h[1:]) <= 100:
+                stats.append(f'percentile(data.value, {int(h[1:])}) AS {h}')
+            else:
+                raise ValueError(f"how: '{h}' is not a known statistic")
+
+        self._check_stamp()
+        where_ids, _, opt_queries = self._resolve_query(qa)
+        temp, tables = Database._temp_tables(where_ids)
+        data, params = _build.select('*', where_ids, 'data', temp)
+        group = ', '.join(['data.param', 'data.sta'] +
+                          ['cal.' + k for k in keys])
+        sql = f"""
+            SELECT
+                param.name AS param,
+                reg.name AS reg,
+                city.nametr AS city,
+                sta.nametr AS sta,
+                {', '.join('cal.' + k for k in keys)},
+                {''.join(i + ', ' for i in stats)}COUNT(data.value) AS count
+            FROM
+                ({data}) data
+            INNER JOIN cal ON cal.id = data.date
+            INNER JOIN param ON param.id = data.param
+            INNER JOIN sta ON sta.id = data.sta
+            INNER JOIN city ON city.id = sta.city
+            INNER JOIN reg ON reg.id = city.reg
+            GROUP BY {group}
+            ORDER BY {group};"""
+        with self._connection() as con:
+            con.create_aggregate('percentile', 2, _utils.Percentile)
+            self._print_query((sql, params, tables), args.pop('verbose'),
+                              args.pop('explain'), con)
+            with Database._with_temp_tables(con, (sql, params, tables)), \
+                    _closing(con.cursor()) as cur:
+                rows = cur.execute(sql, params).fetchall()
+
+        # hours of each period in calendar matching date queries
+        cal = self._calendar()
+        i = self._date_index(opt_queries)
+        periods, hours = _np.unique(_np.column_stack(
+            [cal[k][i] for k in keys]), axis=0, return_counts=True)
+        hours = dict(zip(map(tuple, periods.tolist()), hours.tolist()))
+        rows = [r + (hours.get(r[4:4 + len(keys)], 0),) for r in rows]
+
+        columns = ['param', 'reg', 'city', 'sta'] + list(keys) + how + \
+            ['count', 'hours']
+        return self._return(rows, args.pop('return_type'), columns)
+
     def param(self, *args, **kwargs):
         """
         Parameter data.
@@ -665,6 +1953,7 @@ class Database:
                 zip(['id', 'name', 'long_name', 'unit'],
                     [False, True, True, True])))
 
+        where, params = _build.where_like(args)
         sql = f"""
             SELECT
                 {sel}
@@ -677,10 +1966,10 @@ class Database:
             FROM
                 param
             INNER JOIN unit ON unit.id = param.unit)""" + \
-            _build.where_like(args)
+            where
 
-        self._cur = self._con.cursor().execute(sql + ';')
-        return self._return(return_type, sel.split(','))
+        rows = self._execute(sql + ';', params)
+        return self._return(rows, return_type, sel.split(','))
 
     def unit(self, *args, **kwargs):
         """
@@ -706,6 +1995,7 @@ class Database:
                 zip(['id', 'param', 'name', 'ascii', 'long_name', 'latex'],
                     [False, True, True, True, True, True])))
 
+        where, params = _build.where_like(args)
         sql = f"""
             SELECT
                 {sel}
@@ -720,10 +2010,10 @@ class Database:
             FROM
                 param
             INNER JOIN unit ON unit.id = param.unit)""" + \
-            _build.where_like(args)
+            where
 
-        self._cur = self._con.cursor().execute(sql + ';')
-        return self._return(return_type, sel.split(','))
+        rows = self._execute(sql + ';', params)
+        return self._return(rows, return_type, sel.split(','))
 
     def reg(self, *args, **kwargs):
         """
@@ -749,14 +2039,15 @@ class Database:
             dict(
                 zip(['id', 'name', 'nametr', 'lat', 'lon'],
                     [False, True, False, False, False])))
+        where, params = _build.where_like(args)
         sql = f"""
             SELECT
                 {sel}
             FROM
-                reg""" + _build.where_like(args)
+                reg""" + where
 
-        self._cur = self._con.cursor().execute(sql + ';')
-        return self._return(return_type, sel.split(','))
+        rows = self._execute(sql + ';', params)
+        return self._return(rows, return_type, sel.split(','))
 
     def city(self, *args, **kwargs):
         """
@@ -789,6 +2080,7 @@ class Database:
                      'lat', 'lon'],
                     [True, False, False, True, False, False, False])))
 
+        where, params = _build.where_like(args)
         sql = f"""
             SELECT
                 {sel}
@@ -804,10 +2096,10 @@ class Database:
             FROM
                 city
             INNER JOIN reg ON reg.id = city.reg)""" + \
-            _build.where_like(args)
+            where
 
-        self._cur = self._con.cursor().execute(sql + ';')
-        ret = self._return(return_type, sel.split(','))
+        rows = self._execute(sql + ';', params)
+        ret = self._return(rows, return_type, sel.split(','))
         if return_type == 'df' and set_index:
             cols = ret.columns.tolist()
             for n in ['id', 'name', 'nametr', 'lat', 'lon']:
@@ -849,6 +2141,7 @@ class Database:
                     [True, False, False, True, False,
                      True, False, False, False])))
 
+        where, params = _build.where_like(args)
         sql = f"""
             SELECT
                 {sel}
@@ -866,10 +2159,10 @@ class Database:
                 sta
             INNER JOIN reg ON reg.id = city.reg
             INNER JOIN city ON city.id = sta.city)""" + \
-            _build.where_like(args)
+            where
 
-        self._cur = self._con.cursor().execute(sql + ';')
-        ret = self._return(return_type, sel.split(','))
+        rows = self._execute(sql + ';', params)
+        ret = self._return(rows, return_type, sel.split(','))
         if return_type == 'df' and set_index:
             cols = ret.columns.tolist()
             for n in ['id', 'name', 'nametr', 'lat', 'lon']:
@@ -920,6 +2213,7 @@ class Database:
             dict(
                 zip(['param', 'region', 'city', 'id', 'station', 'value'],
                     [True, True, True, False, True, True])))
+        where, params = _build.where_like(args)
         sql = f"""
             SELECT
                 {sel}
@@ -937,10 +2231,10 @@ class Database:
             INNER JOIN param ON param.id = measurement.param
             INNER JOIN city ON city.id = sta.city
             INNER JOIN reg ON reg.id = city.reg)""" + \
-            _build.where_like(args)
+            where
 
-        self._cur = self._con.cursor().execute(sql + ';')
-        df = self._return('df', sel.split(','))
+        rows = self._execute(sql + ';', params)
+        df = self._return(rows, 'df', sel.split(','))
         T = 'X' if as_str else True
         F = '' if as_str else False
         df['value'] = T
@@ -972,6 +2266,84 @@ class Database:
 
         return df
 
+    # %%-------- async
+
+    def _get_executor(self):
+        """Executor of async methods, created on first use."""
+        with self._lock:
+            if self._executor is None:
+                n = 1 if self._pool is None else self._pool.size
+                self._executor = _ThreadPoolExecutor(
+                    max_workers=n, thread_name_prefix='airdb')
+            return self._executor
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking method on the executor of async methods."""
+        loop = _asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(),
+                                          _partial(func, *args, **kwargs))
+
+    def _query_materialized(self, *args, **kwargs):
+        """Query database and return a list instead of a generator."""
+        ret = self.query(*args, **kwargs)
+        return list(ret) if isinstance(ret, _GeneratorType) else ret
+
+    async def aquery(self, *args, **kwargs):
+        """
+        Query database without blocking the event loop.
+
+        Takes the same arguments as query. Fetching and conversion of
+        results run on a dedicated executor. A return_type of gen is
+        returned as list; use astream to iterate rows in batches.
+        """
+        return await self._run(self._query_materialized, *args, **kwargs)
+
+    async def aparam(self, *args, **kwargs):
+        """Async version of param."""
+        return await self._run(self.param, *args, **kwargs)
+
+    async def acity(self, *args, **kwargs):
+        """Async version of city."""
+        return await self._run(self.city, *args, **kwargs)
+
+    async def asta(self, *args, **kwargs):
+        """Async version of sta."""
+        return await self._run(self.sta, *args, **kwargs)
+
+    async def ameasured(self, *args, **kwargs):
+        """Async version of measured."""
+        return await self._run(self.measured, *args, **kwargs)
+
+    async def astream(self, *args, batch_size=10000, **kwargs):
+        """
+        Stream query results in batches of rows.
+
+        Takes the same query arguments as query except return_type.
+        Each batch is fetched on the executor so that other coroutines
+        keep running during long queries.
+
+            async for rows in db.astream('pm10', city='adana'):
+                ...
+
+        Args:
+            batch_size (int): Maximum number of rows in a batch
+        Return:
+            Async generator of lists of rows
+        """
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+        kwargs['return_type'] = 'gen'
+        gen = await self._run(self.query, *args, **kwargs)
+        try:
+            while True:
+                rows = await self._run(lambda: list(_islice(gen, batch_size)))
+                if len(rows) == 0:
+                    break
+                yield rows
+        finally:
+            # release connection of generator on the executor
+            await self._run(gen.close)
+
     def print_lic(self):
         """Print license information."""
         fn = _path.join(options.db_path, self._name + '.LICENSE')
@@ -1010,40 +2382,62 @@ class Database:
         x.to_netcdf(file, encoding=enc)
 
     @staticmethod
-    def install(pth):  # pylint: disable=R0914
+    def _fetch(pth, checksum=None, progress=None):
+        """
+        Get a local file from a local path or URL.
+
+        URLs are downloaded to '.download' directory in options.db_path.
+        Download resumes if it was interrupted before. Checksum is verified
+        while downloading and local files are verified in place without a
+        copy.
+
+        Args:
+            pth      (str): A local path or URL to file
+            checksum (str): '<algorithm>:<hex digest>' or a sha256 hex
+                            digest of file. Default is not to verify.
+            progress (callable): Called with received and total bytes
+                            while downloading as in download.download
+        Return (tuple):
+            Path to local file and whether it is downloaded
+        """
+        from . import download  # pylint: disable=C0415
+        if download.is_url(pth):
+            pat = options.github_pat
+            headers = {'Authorization': f'token {pat}'} if pat != '' else {}
+            dest = _path.join(options.db_path, '.download')
+            return download.download(pth, dest, checksum, headers,
+                                     progress=progress), True
+        if _path.exists(pth):
+            download.checksum_file(pth, checksum)
+            return pth, False
+        raise ValueError('pth argument is not valid.')
+
+    @staticmethod
+    def install(pth, checksum=None, progress=None):  # pylint: disable=R0914
         """
         Install a database.
 
+        Interrupted downloads are resumed by calling install again. Archive
+        is unpacked from downloaded or local file and downloaded file is
+        removed after installation.
+
         Args:
-            pth   (str): A local path or URL to database installation file
+            pth      (str): A local path or URL to database installation file
+            checksum (str): '<algorithm>:<hex digest>' or a sha256 hex
+                            digest of installation file
+            progress (callable): Called with received and total bytes
+                            while downloading installation file. Total is
+                            None if unknown.
         """
         # pylint: disable=C0415
 
-        pat = options.github_pat
         import shutil as sh
         from tempfile import TemporaryDirectory as tmpdir
+        from . import download
+        if download.is_url(pth):
+            print('Downloading database...')
+        path_to_file, downloaded = Database._fetch(pth, checksum, progress)
         with tmpdir() as tdir:
-            if pth.startswith('http://') or pth.startswith('https://'):
-                from urllib.request import Request
-                from urllib.request import urlopen
-                from urllib.parse import urlparse
-                fn = _path.basename(urlparse(pth).path)
-                path_to_file = _path.join(tdir, fn)
-                print('Downloading database...')
-                req = Request(pth)
-
-                if pat != '':
-                    req.add_header("Authorization", f"token {pat}")
-
-                with urlopen(req) as resp, open(path_to_file, 'wb') as f:
-                    sh.copyfileobj(resp, f)
-            elif _path.exists(pth):
-                fn = _path.basename(pth)
-                path_to_file = _path.join(tdir, fn)
-                sh.copyfile(pth, path_to_file)
-            else:
-                raise ValueError('pth argument is not valid.')
-
             sh.unpack_archive(path_to_file, tdir)
             archive_dir = [p for p in _os.scandir(tdir) if p.is_dir()]
             if len(archive_dir) > 0:
@@ -1062,6 +2456,8 @@ class Database:
                     script.install(options.db_path)
             else:
                 raise FileNotFoundError('Installation script was not found')
+        if downloaded:
+            _os.remove(path_to_file)
 
     @staticmethod
     def install_github(user, repo):
@@ -1079,3 +2475,33 @@ class Database:
     def install_sample():
         """Install sample database."""
         Database.install_github('isezen', 'air-db.samp')
+
+
+_worker_dbs = {}
+
+
+def _query_partition(snapshot, name, query, sel, opt_queries,
+                     include_nan=True):
+    """
+    Execute a partition of a parallel query in a worker process.
+
+    Options of worker process are set to the snapshot of options of the
+    parent process. Database is opened once per worker process and again
+    if options are changed.
+
+    Return (tuple):
+        Columnar result and QueryStats of partition
+    """
+    options.restore(snapshot)
+    key = tuple(sorted(snapshot.items()))
+    if name in _worker_dbs and _worker_dbs[name][0] != key:
+        _worker_dbs.pop(name)[1].close()
+    if name not in _worker_dbs:
+        _worker_dbs[name] = key, Database(name, pool_size=1)
+    db = _worker_dbs[name][1]
+    stats = _QueryStats('numpy')
+    batches = db._batches(  # pylint: disable=W0212
+        query, sel, opt_queries, include_nan, stats)
+    return _utils.to_columns(
+        batches, sel, Database._dtypes,
+        categories=db._categories()), stats  # pylint: disable=W0212
@@ -0,0 +1,161 @@
+"""
+airdb benchmark module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module times Database queries on a synthetic database to keep a
+baseline of performance. Run it as
+
+    python -m airdb.benchmark --sta 20 --param 3 --years 2
+"""
+
+# pylint: disable=C0103, C0201
+import argparse as _argparse
+import tracemalloc as _tracemalloc
+from importlib.util import find_spec as _find_spec
+from tempfile import TemporaryDirectory as _TemporaryDirectory
+from time import perf_counter as _perf_counter
+import pandas as _pd
+
+from . import Database as _Database
+from . import options as _options
+from . import __version__
+from . import synthetic as _synthetic
+
+
+def cases():
+    """
+    Get benchmark cases.
+
+    Return (dict):
+        A dict of case name: function of a Database object
+    """
+    def _query(return_type, include_nan):
+        def _run(db):
+            ret = db.query(return_type=return_type, include_nan=include_nan)
+            if return_type == 'xarray_lazy':
+                return ret.compute()
+            return list(ret) if return_type == 'gen' else ret
+        return _run
+
+    ret = {}
+    for rt in _Database._return_types:  # pylint: disable=W0212
+        if rt == 'arrow' and _find_spec('pyarrow') is None or \
+                rt == 'xarray_lazy' and _find_spec('dask') is None:
+            continue
+        # wide results are always dense
+        for nan in (True, False) if rt != 'wide' else (True,):
+            ret[f'query-{rt}-nan' if nan and rt != 'wide' else
+                f'query-{rt}'] = _query(rt, nan)
+    scans = {}
+
+    def _fill_nan(db):
+        # pylint: disable=W0212
+        # rows are read in the first run, so that best time of repeated
+        # runs is the time of NaN filling of series only
+        if id(db) not in scans:
+            where = {'param': [], 'sta': [], 'date': []}
+            scans[id(db)] = tuple(db._scan(db._scan_query([where])).values())
+        for _ in db._split_batches(scans[id(db)], ['param', 'sta', 'date',
+                                                   'value'], db._calendar()):
+            pass
+
+    ret['fill-nan'] = _fill_nan
+    ret['measured'] = lambda db: db.measured()
+    ret['measured-wide'] = lambda db: db.measured(wide=True)
+    return ret
+
+
+def _measure(db, func):
+    """Get elapsed time and peak traced memory of a single run."""
+    t = _perf_counter()
+    func(db)
+    elapsed = _perf_counter() - t
+    _tracemalloc.start()
+    try:
+        func(db)
+        peak = _tracemalloc.get_traced_memory()[1]
+    finally:
+        _tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(name=None, repeat=3, select=None, **kwargs):
+    """
+    Run benchmark cases.
+
+    Each case is timed repeat times and the best time is reported. Peak
+    memory is measured in a separate run under tracemalloc, so that
+    tracing does not slow down timed runs. Result cache is disabled.
+
+    Args:
+        name   (str)       : Database name. If None, a synthetic database
+                             is created in a temporary directory by
+                             synthetic.create with kwargs.
+        repeat (int)       : Number of timed runs of each case
+        select (str, list) : Names of cases to run. Default is all.
+    Return (DataFrame):
+        case, seconds, rows, rows_per_sec and peak_mb of each case
+    """
+    if name is None:
+        with _TemporaryDirectory() as tdir:
+            _synthetic.create('bench', db_path=tdir, **kwargs)
+            db_path = _options.db_path
+            _options.db_path = tdir
+            try:
+                return run('bench', repeat, select)
+            finally:
+                _options.db_path = db_path
+
+    funcs = cases()
+    if select is not None:
+        select = [select] if isinstance(select, str) else select
+        funcs = {k: funcs[k] for k in select}
+    rows = []
+    with _Database(name, cache_size=0) as db:
+        for case, func in funcs.items():
+            times = []
+            for _ in range(repeat):
+                t = _perf_counter()
+                func(db)
+                times.append(_perf_counter() - t)
+            n = db.last_stats.rows if case.startswith('query') else None
+            _, peak = _measure(db, func)
+            best = min(times)
+            rows.append((case, best, n, None if n is None else n / best,
+                         peak / 2 ** 20))
+    return _pd.DataFrame(rows, columns=['case', 'seconds', 'rows',
+                                        'rows_per_sec', 'peak_mb'])
+
+
+def main(args=None):
+    """Run benchmark from command line."""
+    p = _argparse.ArgumentParser(
+        prog='python -m airdb.benchmark',
+        description='Benchmark airdb queries on a synthetic database.')
+    p.add_argument('--name', default=None,
+                   help='benchmark an installed database instead')
+    p.add_argument('--sta', type=int, default=20, help='number of stations')
+    p.add_argument('--param', type=int, default=3,
+                   help='number of parameters')
+    p.add_argument('--years', type=int, default=1, help='number of years')
+    p.add_argument('--missing', type=float, default=0.1,
+                   help='ratio of missing values')
+    p.add_argument('--seed', type=int, default=0, help='random seed')
+    p.add_argument('--repeat', type=int, default=3,
+                   help='number of timed runs')
+    p.add_argument('--case', action='append', default=None,
+                   help='case to run, can be repeated')
+    p.add_argument('--output', default=None, help='write results to csv')
+    a = p.parse_args(args)
+    kwargs = {} if a.name is not None else \
+        {'n_sta': a.sta, 'n_param': a.param, 'years': a.years,
+         'missing': a.missing, 'seed': a.seed}
+    df = run(a.name, a.repeat, a.case, **kwargs)
+    print(f'airdb {__version__}', kwargs)
+    print(df.to_string(index=False))
+    if a.output is not None:
+        df.to_csv(a.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+airdb cache module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module keeps the result cache of Database queries.
+"""
+
+# pylint: disable=C0103, C0201
+import sys as _sys
+from collections import OrderedDict as _OrderedDict
+from collections import namedtuple as _namedtuple
+
+CacheInfo = _namedtuple(
+    'CacheInfo', ['hits', 'misses', 'evictions', 'entries', 'nbytes',
+                  'max_bytes'])
+
+# number of first items of lists to estimate size of lists from
+_sample = 64
+
+
+def sizeof(x, deep=True):
+    """
+    Estimate memory size of a query result in bytes.
+
+    If deep is False, the result is not walked. Size of lists is
+    extrapolated from their first items and Python objects in DataFrames
+    are not counted.
+
+    Args:
+        x (DataFrame, DataArray, Dataset, Columns, list): Query result
+        deep (bool): Count each item of lists and Python objects
+    Return (int):
+        Size in bytes
+    """
+    if hasattr(x, 'memory_usage'):  # DataFrame
+        return int(x.memory_usage(index=True, deep=deep).sum())
+    if hasattr(x, 'nbytes'):  # DataArray, Dataset, pyarrow.Table
+        return int(x.nbytes)
+    if isinstance(x, dict):  # Columns
+        return sum(sizeof(v, deep) for v in x.values()) + \
+            sum(sizeof(v, deep) for v in
+                getattr(x, 'categories', {}).values())
+    if isinstance(x, (list, tuple)):
+        if deep or len(x) <= _sample:
+            return _sys.getsizeof(x) + sum(sizeof(i, deep) for i in x)
+        n = sum(sizeof(i, deep) for i in x[:_sample])
+        return _sys.getsizeof(x) + n * len(x) // _sample
+    return _sys.getsizeof(x)
+
+
+def copy(x):
+    """Copy a query result so that cached object is not modified."""
+    if isinstance(x, list):
+        return [list(i) if isinstance(i, list) else i for i in x]
+    if not hasattr(x, 'copy'):  # immutable, e.g. pyarrow.Table
+        return x
+    return x.copy()
+
+
+class ResultCache:
+    """LRU cache of query results bounded by size in bytes."""
+
+    def __init__(self, max_bytes):
+        """
+        Create a ResultCache object.
+
+        Args:
+            max_bytes (int): Maximum total size of cached results in bytes
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._data = _OrderedDict()
+
+    def __repr__(self):
+        """Represent class object as a string."""
+        return str(self.info())
+
+    def __len__(self):
+        """Number of cached results."""
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Get a copy of cached result.
+
+        Args:
+            key (tuple): Cache key
+        Return:
+            Copy of cached result or None if key is not cached
+        """
+        if key not in self._data:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return copy(self._data[key][0])
+
+    def put(self, key, value, nbytes=None):
+        """
+        Cache a copy of a result and evict least recently used results.
+
+        Results larger than max_bytes are not cached.
+
+        Args:
+            key    (tuple): Cache key
+            value         : Query result
+            nbytes (int)  : Size of value if it is known
+        """
+        if nbytes is None:
+            nbytes = sizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        if key in self._data:
+            self.nbytes -= self._data.pop(key)[1]
+        self._data[key] = (copy(value), nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, n) = self._data.popitem(last=False)
+            self.nbytes -= n
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all cached results."""
+        self._data.clear()
+        self.nbytes = 0
+
+    def info(self):
+        """Cache statistics."""
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         len(self._data), self.nbytes, self.max_bytes)
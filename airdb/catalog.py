@@ -0,0 +1,160 @@
+"""
+airdb catalog module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module keeps an in-memory catalog of metadata tables of a database.
+"""
+
+# pylint: disable=C0103, C0201
+import re as _re
+from contextlib import closing as _closing
+import numpy as _np
+
+from .utils import to_ascii as _to_ascii
+
+
+class Catalog:
+    """In-memory catalog of metadata tables."""
+
+    _tables = {'param': ('id', 'name', 'long_name', 'unit'),
+               'unit': ('id', 'name', 'ascii', 'long_name', 'latex'),
+               'reg': ('id', 'name', 'nametr', 'lat', 'lon'),
+               'city': ('id', 'name', 'nametr', 'reg', 'lat', 'lon'),
+               'sta': ('id', 'name', 'nametr', 'city', 'lat', 'lon'),
+               'measurement': ('param', 'sta', 'value')}
+    _parents = {'city': 'reg', 'sta': 'city'}
+
+    def __init__(self, con):
+        """
+        Create a Catalog object.
+
+        Args:
+            con (sqlite3.Connection): Connection to database
+        """
+        self.tables = {}
+        self._names = {}
+        self.load(con)
+
+    def __repr__(self):
+        """Represent class object as a string."""
+        s = ''.join(f' {k: <11}: {len(v[self._tables[k][0]])} rows\n'
+                    for k, v in self.tables.items())
+        return 'Catalog:\n' + s
+
+    def load(self, con):
+        """
+        Load metadata tables from database.
+
+        Args:
+            con (sqlite3.Connection): Connection to database
+        """
+        tables = {}
+        for t, cols in Catalog._tables.items():
+            sql = f"SELECT {','.join(cols)} FROM {t}"
+            if cols[0] == 'id':
+                sql += ' ORDER BY id'
+            with _closing(con.cursor()) as cur:
+                rows = cur.execute(sql).fetchall()
+            values = list(zip(*rows)) if len(rows) > 0 else [()] * len(cols)
+            tables[t] = {}
+            for k, v in zip(cols, values):
+                if k in ('lat', 'lon'):
+                    tables[t][k] = _np.array(v, dtype=float)
+                elif k in ('id', 'unit', 'reg', 'city', 'param', 'sta'):
+                    tables[t][k] = _np.array(v, dtype=_np.int64)
+                else:
+                    tables[t][k] = _np.empty(len(v), dtype=object)
+                    tables[t][k][:] = v
+        names = {}
+        for t in ('param', 'reg', 'city', 'sta'):
+            names[t] = {}
+            for i, n in enumerate(tables[t]['name']):
+                names[t].setdefault(n, []).append(i)
+        self.tables = tables
+        self._names = names
+
+    @staticmethod
+    def _to_list(x):
+        """Convert a query value to a list of names."""
+        if x is None:
+            return []
+        if isinstance(x, str):
+            x = x.split(',') if ',' in x else [x]
+        return [_to_ascii(str(i)) for i in x if i != '' and i is not None]
+
+    def ids(self, table, names='', parent=None):
+        """
+        Get ids of table rows by exact names.
+
+        Args:
+            table  (str)      : One of param, reg, city, sta
+            names  (str, list): Name(s) to search. Empty matches all rows.
+            parent (list)     : Ids of parent rows (reg ids for city and
+                                city ids for sta). Empty matches all rows.
+        Return (list):
+            Sorted list of ids
+        """
+        t = self.tables[table]
+        mask = _np.ones(len(t['id']), dtype=bool)
+        names = Catalog._to_list(names)
+        if len(names) > 0:
+            mask[:] = False
+            for n in names:
+                mask[self._names[table].get(n, [])] = True
+        if parent is not None and len(parent) > 0:
+            mask &= _np.isin(t[Catalog._parents[table]], parent)
+        return t['id'][mask].tolist()
+
+    def match(self, table, name='', city='', region=''):
+        """
+        Get ids of table rows by names with LIKE operator semantics.
+
+        Args:
+            table  (str)      : One of param, reg, city, sta
+            name   (str, list): Name pattern(s) to search
+            city   (str, list): City name pattern(s) for sta table
+            region (str, list): Region name pattern(s) for city and sta
+                                tables
+        Return (list):
+            Sorted list of ids
+        """
+        t = self.tables[table]
+        mask = self._like(t['name'], name)
+        if table == 'sta' and (Catalog._to_list(city) or
+                               Catalog._to_list(region)):
+            mask &= _np.isin(t['city'],
+                             self.match('city', city, region=region))
+        elif table == 'city' and Catalog._to_list(region):
+            mask &= _np.isin(t['reg'], self.match('reg', region))
+        return t['id'][mask].tolist()
+
+    def measured(self, param='', city='', station='', region=''):
+        """
+        Get (param id, sta id) pairs of measurement table.
+
+        Args:
+            param   (str, list): Parameter name pattern(s)
+            city    (str, list): City name pattern(s)
+            station (str, list): Station name pattern(s)
+            region  (str, list): Region name pattern(s)
+        Return (list):
+            List of (param id, sta id) tuples
+        """
+        m = self.tables['measurement']
+        mask = _np.isin(m['param'], self.match('param', param)) & \
+            _np.isin(m['sta'], self.match('sta', station, city, region))
+        return list(zip(m['param'][mask].tolist(), m['sta'][mask].tolist()))
+
+    @staticmethod
+    def _like(values, patterns):
+        """Match an array of names with LIKE patterns."""
+        patterns = Catalog._to_list(patterns)
+        if len(patterns) == 0:
+            return _np.ones(len(values), dtype=bool)
+        regex = '|'.join(
+            '(?:' + ''.join('.*' if c == '%' else '.' if c == '_'
+                            else _re.escape(c) for c in p) + ')'
+            for p in patterns)
+        regex = _re.compile(regex, _re.IGNORECASE | _re.DOTALL)
+        return _np.array([v is not None and regex.fullmatch(v) is not None
+                          for v in values], dtype=bool)
@@ -29,6 +29,35 @@ class Options(metaclass=_Singleton):
         """Initialize."""
         self._db_path = None
         self._github_pat = None
+        self._cached_statements = 128
+        self._cache_size = 0
+        self._read_only = False
+        self._immutable = False
+        self._mmap_size = None
+        self._page_cache_size = None
+        self._temp_store = None
+        self._query_only = None
+        self._temp_table_threshold = 256
+
+    def snapshot(self):
+        """
+        Get values of options.
+
+        db_path is resolved, so that it is the same in other processes.
+
+        Return (dict):
+            A dict of values to restore options, e.g. in another process
+        """
+        return dict(vars(self), _db_path=self.db_path)
+
+    def restore(self, snapshot):
+        """
+        Set options to values of a snapshot.
+
+        Args:
+            snapshot (dict): Values of options returned by snapshot
+        """
+        vars(self).update(snapshot)
 
     @property
     def db_path(self):
@@ -70,3 +99,121 @@ class Options(metaclass=_Singleton):
             self._github_pat = new_pat
         else:
             ValueError('github_pat is not correct')
+
+    @property
+    def cached_statements(self):
+        """Size of prepared statement cache of database connections."""
+        return self._cached_statements
+
+    @cached_statements.setter
+    def cached_statements(self, value):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError('cached_statements must be a positive integer')
+        self._cached_statements = value
+
+    @property
+    def cache_size(self):
+        """Default maximum size of query result cache in bytes."""
+        return self._cache_size
+
+    @cache_size.setter
+    def cache_size(self, value):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError('cache_size must be a positive integer')
+        self._cache_size = value
+
+    @property
+    def read_only(self):
+        """Open database connections in read-only mode."""
+        return self._read_only
+
+    @read_only.setter
+    def read_only(self, value):
+        if not isinstance(value, bool):
+            raise ValueError('read_only must be True or False')
+        self._read_only = value
+
+    @property
+    def immutable(self):
+        """
+        Open database connections in read-only and immutable mode.
+
+        sqlite does not lock an immutable database and does not check
+        whether it is changed, so it must not be modified while open.
+        """
+        return self._immutable
+
+    @immutable.setter
+    def immutable(self, value):
+        if not isinstance(value, bool):
+            raise ValueError('immutable must be True or False')
+        self._immutable = value
+
+    @property
+    def mmap_size(self):
+        """mmap_size PRAGMA of connections in bytes. None is not set."""
+        return self._mmap_size
+
+    @mmap_size.setter
+    def mmap_size(self, value):
+        if value is not None and (not isinstance(value, int) or value < 0):
+            raise ValueError('mmap_size must be a positive integer or None')
+        self._mmap_size = value
+
+    @property
+    def page_cache_size(self):
+        """
+        cache_size PRAGMA of connections. None is not set.
+
+        Positive values are number of pages and negative values are size
+        in KiB.
+        """
+        return self._page_cache_size
+
+    @page_cache_size.setter
+    def page_cache_size(self, value):
+        if value is not None and not isinstance(value, int):
+            raise ValueError('page_cache_size must be an integer or None')
+        self._page_cache_size = value
+
+    @property
+    def temp_store(self):
+        """temp_store PRAGMA of connections. None is not set."""
+        return self._temp_store
+
+    @temp_store.setter
+    def temp_store(self, value):
+        values = ('default', 'file', 'memory')
+        if value is not None and value not in values:
+            raise ValueError(f'temp_store must be one of {values} or None')
+        self._temp_store = value
+
+    @property
+    def query_only(self):
+        """query_only PRAGMA of connections. None is not set."""
+        return self._query_only
+
+    @query_only.setter
+    def query_only(self, value):
+        if value is not None and not isinstance(value, bool):
+            raise ValueError('query_only must be True, False or None')
+        self._query_only = value
+
+    @property
+    def temp_table_threshold(self):
+        """
+        Size of id sets of a query moved to temporary tables.
+
+        Station or param ids and date ranges of a query are written to
+        temporary tables of the connection and joined to data table if
+        there are more than this many of them. None never uses temporary
+        tables.
+        """
+        return self._temp_table_threshold
+
+    @temp_table_threshold.setter
+    def temp_table_threshold(self, value):
+        if value is not None and (not isinstance(value, int) or value < 0):
+            raise ValueError('temp_table_threshold must be a non-negative '
+                             'integer or None')
+        self._temp_table_threshold = value
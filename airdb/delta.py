@@ -0,0 +1,202 @@
+"""
+airdb delta module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module creates and applies delta packages of databases. A delta
+package is a sqlite file with a manifest table and new rows of cal, data
+and measurement tables. Deltas of a database are applied in order, each
+one in a single transaction.
+"""
+
+# pylint: disable=C0103, C0201
+import sqlite3 as _sq
+import uuid as _uuid
+from contextlib import closing as _closing
+from datetime import datetime as _datetime
+from datetime import timezone as _timezone
+from os import path as _path
+
+from .__errors__ import DeltaError as _DeltaError
+
+_tables = {'cal': ('id', 'date', 'year', 'month', 'day', 'hour', 'week',
+                   'doy', 'hoy'),
+           'data': ('param', 'sta', 'date', 'value'),
+           'measurement': ('param', 'sta', 'value')}
+
+
+def _now():
+    """Current UTC time as a string."""
+    return _datetime.now(_timezone.utc).isoformat(timespec='seconds')
+
+
+def _schema(prefix=''):
+    """Create table statements of a delta package."""
+    s = f'CREATE TABLE {prefix}manifest (key TEXT PRIMARY KEY, value TEXT);'
+    for t, cols in _tables.items():
+        s += f"CREATE TABLE {prefix}{t} ({', '.join(cols)});"
+    return s
+
+
+def create(path, version, cal=(), data=(), measurement=(), base=None,
+           new_version=None, delta_id=None):
+    """
+    Create a delta package.
+
+    Args:
+        path        (str)     : Path to delta file
+        version     (str)     : Value of version table of databases that
+                                delta can be applied to
+        cal         (iterable): New rows of cal table
+        data        (iterable): New rows of data table
+        measurement (iterable): New rows of measurement table
+        base        (str)     : Id of the delta that must be applied before
+                                this one. None for the first delta.
+        new_version (str)     : New value of version table. Default is not
+                                to change version.
+        delta_id    (str)     : Unique id of delta. Default is a new uuid.
+    Return (str):
+        Id of delta
+    """
+    if _path.exists(path):
+        raise FileExistsError(f"Delta '{path}' already exists.")
+    delta_id = str(_uuid.uuid4()) if delta_id is None else delta_id
+    manifest = {'id': delta_id, 'version': version, 'base': base,
+                'new_version': new_version,
+                'created': _now()}
+    with _closing(_sq.connect(path)) as con:
+        with con:
+            con.executescript(_schema())
+            con.executemany('INSERT INTO manifest VALUES (?, ?)',
+                            manifest.items())
+            for t, rows in zip(_tables, (cal, data, measurement)):
+                cols = _tables[t]
+                con.executemany(
+                    f"INSERT INTO {t} VALUES ({', '.join('?' * len(cols))})",
+                    rows)
+    return delta_id
+
+
+def diff(old, new, path, base=None, new_version=None, delta_id=None):
+    """
+    Create a delta package from two versions of an append-only database.
+
+    Delta contains cal rows of new database after the last cal row of old
+    database, data rows after the last date in data table of old database
+    and measurement rows not in old database.
+
+    Args:
+        old  (str): Path to old database file
+        new  (str): Path to new database file
+        path (str): Path to delta file
+        base, new_version, delta_id: As in create
+    Return (str):
+        Id of delta
+    """
+    with _closing(_sq.connect(new)) as con:
+        con.execute('ATTACH DATABASE ? AS old', (old,))
+        version = con.execute('SELECT value FROM old.version').fetchone()[0]
+        max_cal = con.execute('SELECT MAX(id) FROM old.cal').fetchone()[0]
+        max_date = con.execute('SELECT MAX(date) FROM old.data').fetchone()[0]
+        cal = con.execute(
+            f"SELECT {', '.join(_tables['cal'])} FROM cal WHERE id > ? "
+            'ORDER BY id', (max_cal or 0,))
+        data = con.execute(
+            f"SELECT {', '.join(_tables['data'])} FROM data WHERE date > ? "
+            'ORDER BY param, sta, date', (max_date or 0,))
+        measurement = con.execute(
+            f"SELECT {', '.join(_tables['measurement'])} FROM measurement m "
+            'WHERE NOT EXISTS (SELECT 1 FROM old.measurement o '
+            'WHERE o.param = m.param AND o.sta = m.sta)')
+        return create(path, version, cal.fetchall(), data, measurement,
+                      base=base, new_version=new_version, delta_id=delta_id)
+
+
+def applied(con):
+    """
+    Get applied deltas of a database.
+
+    Args:
+        con (sqlite3.Connection): Connection to database
+    Return (list):
+        List of (id, base, applied) tuples in order of application
+    """
+    t = con.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                    "AND name = 'delta'").fetchall()
+    if len(t) == 0:
+        return []
+    return con.execute(
+        'SELECT id, base, applied FROM delta ORDER BY rowid').fetchall()
+
+
+def apply(con, path):
+    """
+    Apply a delta package to a database.
+
+    Delta is checked against version table and the last applied delta,
+    and its rows are appended in a single transaction. Nothing is changed
+    if a check fails.
+
+    Args:
+        con  (sqlite3.Connection): Writable connection to database
+        path (str): Path to delta file
+    Return (dict):
+        Number of appended rows of cal, data and measurement tables
+    """
+    if not _path.exists(path):
+        raise FileNotFoundError(f"Delta '{path}' cannot be found.")
+    con.execute('ATTACH DATABASE ? AS delta', (path,))
+    try:
+        m = dict(con.execute('SELECT key, value FROM delta.manifest'))
+        version = con.execute('SELECT value FROM main.version').fetchone()[0]
+        if m['version'] != version:
+            raise _DeltaError(f"Delta is for version {m['version']} but "
+                              f'database version is {version}.')
+        hist = applied(con)
+        if m['id'] in [h[0] for h in hist]:
+            raise _DeltaError(f"Delta {m['id']} is already applied.")
+        last = hist[-1][0] if len(hist) > 0 else None
+        if m['base'] != last:
+            raise _DeltaError(f"Delta requires delta {m['base']} to be "
+                              f'applied last but it is {last}.')
+        first_cal, = con.execute('SELECT MIN(id) FROM delta.cal').fetchone()
+        max_cal, = con.execute('SELECT MAX(id) FROM main.cal').fetchone()
+        if first_cal is not None and first_cal <= (max_cal or 0):
+            raise _DeltaError('cal rows of delta overlap with database.')
+        missing, = con.execute(
+            'SELECT COUNT(*) FROM delta.data WHERE date NOT IN '
+            '(SELECT id FROM main.cal UNION SELECT id FROM delta.cal)'
+        ).fetchone()
+        if missing > 0:
+            raise _DeltaError(f'{missing} data rows of delta have no date '
+                              'in cal table.')
+
+        isolation_level = con.isolation_level
+        con.isolation_level = None
+        try:
+            con.execute('BEGIN IMMEDIATE')
+            n = {}
+            for t, cols in _tables.items():
+                cols = ', '.join(cols)
+                sql = f'INSERT INTO main.{t} ({cols}) ' + \
+                    f'SELECT {cols} FROM delta.{t}'
+                if t == 'measurement':
+                    sql += ' d WHERE NOT EXISTS (SELECT 1 FROM ' + \
+                        'main.measurement m WHERE m.param = d.param AND ' + \
+                        'm.sta = d.sta)'
+                n[t] = con.execute(sql).rowcount
+            con.execute('CREATE TABLE IF NOT EXISTS main.delta '
+                        '(id TEXT PRIMARY KEY, base TEXT, applied TEXT)')
+            con.execute('INSERT INTO main.delta VALUES (?, ?, ?)',
+                        (m['id'], m['base'], _now()))
+            if m.get('new_version') is not None:
+                con.execute('UPDATE main.version SET value = ?',
+                            (m['new_version'],))
+            con.execute('COMMIT')
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+        finally:
+            con.isolation_level = isolation_level
+    finally:
+        con.execute('DETACH DATABASE delta')
+    return n
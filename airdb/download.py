@@ -0,0 +1,226 @@
+"""
+airdb download module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module downloads database archives. Downloads are written to a
+partial file which is kept when a download fails, so the next download
+resumes from where it stopped by an HTTP Range request if the file on the
+server has not changed. Checksum of file is computed while streaming.
+"""
+
+# pylint: disable=C0103, C0201
+import hashlib as _hashlib
+import os as _os
+import re as _re
+import time as _time
+from http.client import HTTPException as _HTTPException
+from os import path as _path
+from urllib.error import HTTPError as _HTTPError
+from urllib.error import URLError as _URLError
+from urllib.parse import urlparse as _urlparse
+from urllib.request import Request as _Request
+from urllib.request import urlopen as _urlopen
+
+from .__errors__ import ChecksumError as _ChecksumError
+
+chunk_size = 2 ** 20
+
+
+def _hasher(checksum):
+    """
+    Get hash object and expected digest of a checksum.
+
+    Args:
+        checksum (str): '<algorithm>:<hex digest>' or a sha256 hex digest
+    Return (tuple):
+        hash object and lower case hex digest or (None, None)
+    """
+    if checksum is None:
+        return None, None
+    algo, _, digest = checksum.rpartition(':')
+    return _hashlib.new(algo or 'sha256'), digest.lower()
+
+
+def _verify(h, digest, path):
+    """Raise ChecksumError and remove file if digest does not match."""
+    if h is not None and h.hexdigest() != digest:
+        _os.remove(path)
+        raise _ChecksumError(path, digest, h.hexdigest())
+
+
+def _update(h, path):
+    """Update hash object by contents of a file."""
+    with open(path, 'rb') as f:
+        for b in iter(lambda: f.read(chunk_size), b''):
+            h.update(b)
+
+
+def checksum_file(path, checksum):
+    """
+    Verify checksum of a local file.
+
+    Args:
+        path     (str): Path to file
+        checksum (str): '<algorithm>:<hex digest>' or a sha256 hex digest
+    """
+    h, digest = _hasher(checksum)
+    if h is None:
+        return
+    _update(h, path)
+    if h.hexdigest() != digest:
+        raise _ChecksumError(path, digest, h.hexdigest())
+
+
+def is_url(path):
+    """Check if a path is an http or https URL."""
+    return path.startswith('http://') or path.startswith('https://')
+
+
+def _target(url, dest_dir):
+    """Path to downloaded file of a URL in dest_dir."""
+    fn = _path.basename(_urlparse(url).path) or 'download'
+    key = _hashlib.sha256(url.encode()).hexdigest()[:16]
+    return _path.join(dest_dir, f'{key}-{fn}')
+
+
+def _validator(resp):
+    """Strong ETag or Last-Modified header of a response or None."""
+    etag = resp.headers.get('ETag')
+    if etag is not None and not etag.startswith('W/'):
+        return etag
+    return resp.headers.get('Last-Modified')
+
+
+def _read(path):
+    """Read a text file or return None if it does not exist."""
+    if not _path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _write(path, text):
+    """Write a text file or remove it if text is None."""
+    if text is None:
+        if _path.exists(path):
+            _os.remove(path)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _start(resp):
+    """First byte position of a partial response or None."""
+    m = _re.match(r'bytes (\d+)-', resp.headers.get('Content-Range', ''))
+    return None if m is None else int(m.group(1))
+
+
+def _total(resp, offset):
+    """Total size of file from Content-Range or Content-Length header."""
+    m = _re.match(r'bytes [\d*]+-?\d*/(\d+)',
+                  resp.headers.get('Content-Range', ''))
+    if m is not None:
+        return int(m.group(1))
+    n = resp.headers.get('Content-Length')
+    return None if n is None else offset + int(n)
+
+
+def download(url, dest_dir, checksum=None, headers=None, retries=3,
+             timeout=60, progress=None):
+    """
+    Download a file with resume and checksum verification.
+
+    File is written to '<key>-<name>.part' in dest_dir, where key is a
+    hash of url, and renamed to '<key>-<name>' when complete. ETag or
+    Last-Modified header of response is stored in '<key>-<name>.validator'
+    and if the partial file exists, download resumes from its end by a
+    Range request which is conditional on the stored validator. Servers
+    that ignore Range requests or have a changed file send the whole file,
+    which then replaces the partial file. A partial file without a
+    validator is downloaded again. Connection errors are retried from the
+    last received byte. If a partial response does not start at the end
+    of the partial file, the partial file is removed and download is
+    retried. A downloaded file which exists in dest_dir is reused only if
+    checksum is given and matches.
+
+    Args:
+        url      (str)     : URL of file
+        dest_dir (str)     : Directory of downloaded file
+        checksum (str)     : '<algorithm>:<hex digest>' or a sha256 hex
+                             digest of file. Default is not to verify.
+        headers  (dict)    : Additional request headers
+        retries  (int)     : Number of retries after a connection error
+        timeout  (float)   : Timeout of connection in seconds
+        progress (callable): Called with received and total bytes after
+                             each chunk. Total is None if unknown.
+    Return (str):
+        Path to downloaded file
+    """
+    path = _target(url, dest_dir)
+    part = path + '.part'
+    vfile = path + '.validator'
+    _os.makedirs(dest_dir, exist_ok=True)
+    if _path.exists(path):
+        try:
+            if checksum is not None:
+                checksum_file(path, checksum)
+                return path
+        except _ChecksumError:
+            pass
+        _os.remove(path)
+
+    attempt = 0
+    while True:
+        h, digest = _hasher(checksum)
+        offset = _path.getsize(part) if _path.exists(part) else 0
+        validator = _read(vfile)
+        if validator is None:
+            # partial file of an unknown version cannot be resumed
+            offset = 0
+        req = _Request(url, headers=dict(headers or {}))
+        if offset > 0:
+            req.add_header('Range', f'bytes={offset}-')
+            req.add_header('If-Range', validator)
+        try:
+            with _urlopen(req, timeout=timeout) as resp:
+                if resp.status != 206:
+                    offset = 0
+                    _write(vfile, _validator(resp))
+                elif _start(resp) != offset:
+                    # partial file is downloaded again from the start
+                    _os.remove(part)
+                    raise _URLError(f'server sent content from byte '
+                                    f'{_start(resp)} instead of {offset}')
+                total = _total(resp, offset)
+                if h is not None and offset > 0:
+                    _update(h, part)
+                with open(part, 'ab' if offset > 0 else 'wb') as f:
+                    n = offset
+                    for b in iter(lambda: resp.read(chunk_size), b''):
+                        f.write(b)
+                        if h is not None:
+                            h.update(b)
+                        n += len(b)
+                        if progress is not None:
+                            progress(n, total)
+                if total is not None and n < total:
+                    raise _URLError(f'connection closed at {n} of {total} '
+                                    'bytes')
+            break
+        except _HTTPError as e:
+            # partial file is already complete
+            if e.code == 416 and offset > 0:
+                if h is not None:
+                    _update(h, part)
+                break
+            raise
+        except (_URLError, _HTTPException, ConnectionError, TimeoutError):
+            attempt += 1
+            if attempt > retries:
+                raise
+            _time.sleep(min(2 ** attempt, 30))
+
+    _write(vfile, None)
+    _verify(h, digest, part)
+    _os.replace(part, path)
+    return path
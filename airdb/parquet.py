@@ -0,0 +1,225 @@
+"""
+airdb parquet module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module keeps the Parquet mirror of data table of a database. Mirror
+is a dataset next to database file partitioned by param and year, so that
+queries read only matching partitions and columns.
+"""
+
+# pylint: disable=C0103, C0201
+import json as _json
+import os as _os
+import shutil as _shutil
+from contextlib import closing as _closing
+from itertools import chain as _chain
+from os import path as _path
+import numpy as _np
+
+from . import delta as _delta
+from .__errors__ import StaleMirrorError as _StaleMirrorError
+
+try:
+    import pyarrow as _pa
+    import pyarrow.dataset as _ds
+    import pyarrow.parquet as _pq
+except ImportError as e:
+    raise ImportError('pyarrow is required for parquet engine') from e
+
+_columns = ['sta', 'date', 'value']
+# files starting with '_' are not read as a part of dataset
+_stamp_file = '_stamp.json'
+batch_size = 2 ** 18
+
+
+def mirror_path(db_file):
+    """Path to Parquet mirror of a database file."""
+    return _path.splitext(db_file)[0] + '.parquet'
+
+
+def stamp(con):
+    """
+    Get stamp of data of a database.
+
+    Stamp is made of version table, the last applied delta and the last
+    rows of cal and data tables, so it is changed by appended rows without
+    a full scan of data table.
+
+    Args:
+        con (sqlite3.Connection): Connection to database
+    Return (str):
+        Stamp of data
+    """
+    hist = _delta.applied(con)
+    return _json.dumps({
+        'version': [v for v, in con.execute('SELECT value FROM version')],
+        'delta': hist[-1][0] if len(hist) > 0 else None,
+        'cal': con.execute('SELECT MAX(id) FROM cal').fetchone()[0],
+        'data': con.execute('SELECT MAX(rowid) FROM data').fetchone()[0]})
+
+
+def _arrays(rows):
+    """Convert fetched rows of sta, date and value to arrays."""
+    try:
+        a = _np.fromiter(_chain.from_iterable(rows), _np.float64,
+                         count=3 * len(rows)).reshape(-1, 3)
+    except TypeError:
+        # NULL values
+        a = _np.array(rows, dtype=_np.float64)
+    return (a[:, 0].astype(_np.int32), a[:, 1].astype(_np.int32),
+            a[:, 2].copy())
+
+
+def build(con, path, params, cal):
+    """
+    Export data table to a Parquet dataset partitioned by param and year.
+
+    Rows of each param are streamed by fetchmany into a ParquetWriter per
+    year, so memory is bounded by batch_size rows. Dataset is written to
+    '<path>.tmp' with stamp of data. When complete, an existing mirror is
+    renamed to '<path>.old' before the new one is moved to path and it is
+    removed after, so that a complete mirror is kept if build fails.
+
+    Args:
+        con    (sqlite3.Connection): Connection to database
+        path   (str) : Path to dataset directory
+        params (list): Param ids
+        cal    (dict): Calendar with id and year arrays
+    Return (int):
+        Number of exported rows
+    """
+    tmp, old = path + '.tmp', path + '.old'
+    for p in (tmp, old):
+        if _path.exists(p):
+            _shutil.rmtree(p)
+    _os.makedirs(tmp)
+    with open(_path.join(tmp, _stamp_file), 'w', encoding='utf-8') as f:
+        f.write(stamp(con))
+    schema = _pa.schema([('sta', _pa.int32()), ('date', _pa.int32()),
+                         ('value', _pa.float64())])
+    n = 0
+    sql = 'SELECT sta, date, cast(value AS float) FROM data ' + \
+        'WHERE param = ? ORDER BY sta, date'
+    for p in params:
+        writers = {}
+        try:
+            with _closing(con.cursor()) as cur:
+                cur.execute(sql, (p,))
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if len(rows) == 0:
+                        break
+                    sta, date, value = _arrays(rows)
+                    year = cal['year'][_np.searchsorted(cal['id'], date)]
+                    for y in _np.unique(year).tolist():
+                        i = year == y
+                        if y not in writers:
+                            d = _path.join(tmp, f'param={p}', f'year={y}')
+                            _os.makedirs(d)
+                            writers[y] = _pq.ParquetWriter(
+                                _path.join(d, 'part-0.parquet'), schema)
+                        writers[y].write_table(_pa.table(
+                            [sta[i], date[i], value[i]], schema=schema))
+                    n += len(rows)
+        finally:
+            for w in writers.values():
+                w.close()
+    if _path.exists(path):
+        _os.rename(path, old)
+    _os.rename(tmp, path)
+    if _path.exists(old):
+        _shutil.rmtree(old)
+    return n
+
+
+class Mirror:
+    """Reader of Parquet mirror of data table."""
+
+    def __init__(self, path, data_stamp=None):
+        """
+        Create a Mirror object.
+
+        Args:
+            path       (str): Path to dataset directory
+            data_stamp (str): Stamp of data of database. If given, raises
+                              StaleMirrorError if mirror is built from
+                              another version of data.
+        """
+        if not _path.isdir(path):
+            raise FileNotFoundError(
+                f"Parquet mirror '{path}' cannot be found. "
+                'Create it by Database.build_parquet_mirror().')
+        if data_stamp is not None:
+            sfile = _path.join(path, _stamp_file)
+            built = None
+            if _path.exists(sfile):
+                with open(sfile, encoding='utf-8') as f:
+                    built = f.read()
+            if built != data_stamp:
+                raise _StaleMirrorError(
+                    f"Parquet mirror '{path}' is not built from current "
+                    'data of database. Build it again by '
+                    'Database.build_parquet_mirror().')
+        self.path = path
+        self._dataset = _ds.dataset(path, format='parquet',
+                                    partitioning='hive')
+
+    def __repr__(self):
+        """Represent class object as a string."""
+        return f"Mirror('{self.path}')"
+
+    def params(self):
+        """Sorted param ids in mirror."""
+        return sorted(int(i.name.split('=')[1])
+                      for i in _os.scandir(self.path)
+                      if i.is_dir() and i.name.startswith('param='))
+
+    @staticmethod
+    def _filter(param, sta_ids, date_ranges, years):
+        """Build filter expression. Empty lists are not filtered."""
+        f = _ds.field('param').isin(param) if isinstance(param, list) \
+            else _ds.field('param') == param
+        if len(years) > 0:
+            f &= _ds.field('year').isin(years)
+        if len(sta_ids) > 0:
+            f &= _ds.field('sta').isin(sta_ids)
+        if len(date_ranges) > 0:
+            d = _ds.field('date')
+            g = None
+            for lo, hi in date_ranges:
+                e = (d >= lo) & (d <= hi)
+                g = e if g is None else g | e
+            f &= g
+        return f
+
+    def describe(self, param_ids, sta_ids, date_ranges, years):
+        """Describe columns and filter of a query as a string."""
+        return f'{self.path} columns={_columns} ' + \
+            str(Mirror._filter(param_ids, sta_ids, date_ranges, years))
+
+    def read(self, param, sta_ids, date_ranges, years):
+        """
+        Read rows of a param.
+
+        Partitions are pruned by param and years and only sta, date and
+        value columns are read.
+
+        Args:
+            param       (int) : Param id
+            sta_ids     (list): Station ids. Empty reads all stations.
+            date_ranges (list): List of [first, last] date ids. Empty
+                                reads all dates.
+            years       (list): Years of date ranges
+        Return (tuple):
+            sta, date and value arrays sorted by sta and date
+        """
+        if len(self._dataset.files) == 0:
+            return tuple(_np.empty(0, dtype=t)
+                         for t in (_np.int64, _np.int64, _np.float64))
+        t = self._dataset.to_table(
+            columns=_columns,
+            filter=Mirror._filter(param, sta_ids, date_ranges, years))
+        sta, date, value = (t.column(k).to_numpy() for k in _columns)
+        i = _np.lexsort((date, sta))
+        return (sta[i].astype(_np.int64), date[i].astype(_np.int64),
+                value[i].astype(_np.float64))
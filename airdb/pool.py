@@ -0,0 +1,149 @@
+"""
+airdb pool module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module opens database connections and keeps the connection pool to
+share a database between threads.
+"""
+
+# pylint: disable=C0103, C0201
+import queue as _queue
+import sqlite3 as _sq
+import threading as _threading
+from contextlib import contextmanager as _contextmanager
+from urllib.parse import quote as _quote
+
+from .config import Options as _Options
+
+
+def connect(path, read_only=False, check_same_thread=True,
+            cached_statements=128):
+    """
+    Open a connection to database configured by options.
+
+    Database is opened by a file URI in read-only mode if read_only,
+    options.read_only or options.immutable is True. mmap_size,
+    page_cache_size, temp_store and query_only options are set as PRAGMAs
+    of connection.
+
+    Args:
+        path              (str) : Path to database file
+        read_only         (bool): Open in read-only mode
+        check_same_thread (bool): Allow only creating thread to use
+                                  connection
+        cached_statements (int) : Size of prepared statement cache
+    Return (sqlite3.Connection):
+        Connection to database
+    """
+    options = _Options()
+    kwargs = {'detect_types': _sq.PARSE_DECLTYPES,
+              'cached_statements': cached_statements,
+              'check_same_thread': check_same_thread}
+    if read_only or options.read_only or options.immutable:
+        uri = 'file:' + _quote(path) + '?mode=ro'
+        if options.immutable:
+            uri += '&immutable=1'
+        con = _sq.connect(uri, uri=True, **kwargs)
+    else:
+        con = _sq.connect(path, **kwargs)
+    pragmas = {'mmap_size': options.mmap_size,
+               'cache_size': options.page_cache_size,
+               'temp_store': options.temp_store,
+               'query_only': options.query_only}
+    for k, v in pragmas.items():
+        if v is not None:
+            con.execute(f'PRAGMA {k} = {v if k == "temp_store" else int(v)}')
+    return con
+
+
+class ConnectionPool:
+    """Bounded pool of read-only sqlite connections."""
+
+    def __init__(self, path, size, timeout=None, cached_statements=128):
+        """
+        Create a ConnectionPool object.
+
+        Connections are opened lazily up to size and each one is used by
+        a single thread at a time. A thread which already holds all
+        connections (e.g. by partially consumed generators) cannot borrow
+        another one, since waiting for it would never end.
+
+        Args:
+            path              (str)  : Path to database file
+            size              (int)  : Maximum number of connections
+            timeout           (float): Seconds to wait for a free
+                                       connection. None waits forever.
+            cached_statements (int)  : Size of prepared statement cache
+                                       of each connection
+        """
+        if not isinstance(size, int) or size < 1:
+            raise ValueError('size must be a positive integer')
+        self._path = path
+        self._size = size
+        self._timeout = timeout
+        self._cached_statements = cached_statements
+        self._sem = _threading.BoundedSemaphore(size)
+        self._idle = _queue.LifoQueue()
+        self._cons = []
+        self._owners = {}
+        self._lock = _threading.Lock()
+
+    def __repr__(self):
+        """Represent class object as a string."""
+        return f'ConnectionPool(size={self._size}, open={len(self._cons)})'
+
+    @property
+    def size(self):
+        """Maximum number of connections."""
+        return self._size
+
+    def _connect(self):
+        """Open a new read-only connection."""
+        con = connect(self._path, read_only=True, check_same_thread=False,
+                      cached_statements=self._cached_statements)
+        with self._lock:
+            self._cons.append(con)
+        return con
+
+    @_contextmanager
+    def connection(self):
+        """
+        Borrow a connection from pool.
+
+        A connection is returned to pool when the with block exits.
+        Raises TimeoutError if no connection is released in timeout and
+        RuntimeError if calling thread holds all connections of pool.
+        """
+        ident = _threading.get_ident()
+        with self._lock:
+            held = sum(t == ident for t in self._owners.values())
+        if held >= self._size:
+            raise RuntimeError(
+                f'All {self._size} connections of pool are held by this '
+                'thread. Consume or close generator results before '
+                'another query or increase pool_size.')
+        if not self._sem.acquire(timeout=self._timeout):
+            raise TimeoutError('No free connection in pool')
+        try:
+            try:
+                con = self._idle.get_nowait()
+            except _queue.Empty:
+                con = self._connect()
+            with self._lock:
+                self._owners[id(con)] = ident
+            try:
+                yield con
+            finally:
+                with self._lock:
+                    del self._owners[id(con)]
+                self._idle.put(con)
+        finally:
+            self._sem.release()
+
+    def close(self):
+        """Close all connections."""
+        with self._lock:
+            for con in self._cons:
+                con.close()
+            self._cons = []
+        self._idle = _queue.LifoQueue()
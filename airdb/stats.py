@@ -0,0 +1,144 @@
+"""
+airdb stats module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module keeps timing and row-count statistics of Database queries.
+"""
+
+# pylint: disable=C0103, C0201
+from contextlib import contextmanager as _contextmanager
+from contextlib import nullcontext as _nullcontext
+from time import perf_counter as _perf_counter
+
+from .cache import sizeof as _sizeof
+
+
+def nrows(x, return_type):
+    """
+    Number of rows of a query result.
+
+    Args:
+        x: Query result
+        return_type (str): Return type of query result
+    Return (int):
+        Number of rows. Number of values for xarray results.
+    """
+    if return_type == 'long_list':
+        return len(x[0]) if len(x) > 0 else 0
+    if return_type == 'numpy':
+        return len(next(iter(x.values()))) if len(x) > 0 else 0
+    if return_type == 'xarray':
+        if hasattr(x, 'data_vars'):  # Dataset
+            return sum(v.size for v in x.data_vars.values())
+        return x.size
+    return len(x)
+
+
+def timer(stats, stage):
+    """Timer of a stage or a no-op context if stats is None."""
+    return _nullcontext() if stats is None else stats.timer(stage)
+
+
+class QueryStats:
+    """
+    Statistics of a single query.
+
+    Times are in seconds and exclusive, so time of a stage does not
+    include time of stages run inside it. Stages are:
+
+        validate : Checking query arguments
+        resolve  : Resolving names and dates to ids
+        fetch    : Fetching rows from sqlite
+        fill     : Filling gaps with NaN and resolving dates by ids
+        convert  : Building result of return type
+
+    Statistics of lazy results (gen return type and chunksize) are
+    updated while the result is consumed. nbytes is exact if the result is
+    cached or statistics are passed to a callback, otherwise it is an
+    estimate.
+    """
+
+    stages = ('validate', 'resolve', 'fetch', 'fill', 'convert')
+
+    def __init__(self, return_type):
+        """
+        Create a QueryStats object.
+
+        Args:
+            return_type (str): Return type of query
+        """
+        self.return_type = return_type
+        self.times = dict.fromkeys(QueryStats.stages, 0.0)
+        self.total = 0.0
+        self.rows = 0
+        self.rows_fetched = 0
+        self.rows_nan = 0
+        self.nbytes = 0
+        self.cache_hit = False
+        self._start = _perf_counter()
+        self._stack = []
+
+    def __repr__(self):
+        """Represent class object as a string."""
+        s = ''.join(f' {k: <12}: {v:.3f} s\n' for k, v in self.times.items())
+        s += f' {"total": <12}: {self.total:.3f} s\n'
+        for k in ('rows', 'rows_fetched', 'rows_nan', 'nbytes', 'cache_hit'):
+            s += f' {k: <12}: {getattr(self, k)}\n'
+        return f'QueryStats ({self.return_type}):\n' + s
+
+    def __getstate__(self):
+        """Get state without running timers to pickle."""
+        state = self.__dict__.copy()
+        state['_stack'] = []
+        return state
+
+    @_contextmanager
+    def timer(self, stage):
+        """
+        Add time of with block to a stage.
+
+        Args:
+            stage (str): Name of stage
+        """
+        t = _perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield self
+        finally:
+            dt = _perf_counter() - t
+            self.times[stage] += dt - self._stack.pop()
+            if len(self._stack) > 0:
+                self._stack[-1] += dt
+
+    def finish(self, result=None, nbytes=None):
+        """
+        Set total time and size of result.
+
+        Total time includes the time to get size of result.
+
+        Args:
+            result: Materialized query result. None for lazy results.
+            nbytes (int): Size of result. If None, it is estimated by
+                          cache.sizeof without walking the result.
+        """
+        if result is not None:
+            self.rows = nrows(result, self.return_type)
+            self.nbytes = _sizeof(result, deep=False) if nbytes is None \
+                else nbytes
+        self.total = _perf_counter() - self._start
+
+    def merge(self, other):
+        """
+        Add row counts of another QueryStats, e.g. of a query partition.
+
+        Args:
+            other (QueryStats): Statistics to add
+        """
+        self.rows_fetched += other.rows_fetched
+        self.rows_nan += other.rows_nan
+
+    def to_dict(self):
+        """Get statistics as a dict."""
+        d = {k: v for k, v in self.__dict__.items() if k[0] != '_'}
+        d['times'] = dict(self.times)
+        return d
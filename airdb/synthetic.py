@@ -0,0 +1,178 @@
+"""
+airdb synthetic module.
+
+~~~~~~~~~~~~~~~~~~~~~
+This module creates synthetic airdb databases of configurable size to test
+and benchmark airdb without downloading a database.
+"""
+
+# pylint: disable=C0103, C0201
+import sqlite3 as _sq
+from contextlib import closing as _closing
+from os import path as _path
+import os as _os
+import pandas as _pd
+import numpy as _np
+
+from .config import Options as _Options
+from .utils import to_ascii as _to_ascii
+
+_schema = """
+    CREATE TABLE version (value TEXT);
+    CREATE TABLE unit (id INTEGER PRIMARY KEY, name TEXT, ascii TEXT,
+                       long_name TEXT, latex TEXT);
+    CREATE TABLE param (id INTEGER PRIMARY KEY, name TEXT, long_name TEXT,
+                        unit INTEGER REFERENCES unit(id));
+    CREATE TABLE reg (id INTEGER PRIMARY KEY, name TEXT, nametr TEXT,
+                      lat REAL, lon REAL);
+    CREATE TABLE city (id INTEGER PRIMARY KEY, name TEXT, nametr TEXT,
+                       reg INTEGER REFERENCES reg(id), lat REAL, lon REAL);
+    CREATE TABLE sta (id INTEGER PRIMARY KEY, name TEXT, nametr TEXT,
+                      city INTEGER REFERENCES city(id), lat REAL, lon REAL);
+    CREATE TABLE cal (id INTEGER PRIMARY KEY, date TEXT, year INTEGER,
+                      month INTEGER, day INTEGER, hour INTEGER,
+                      week INTEGER, doy INTEGER, hoy INTEGER);
+    CREATE TABLE measurement (param INTEGER REFERENCES param(id),
+                              sta INTEGER REFERENCES sta(id),
+                              value INTEGER);
+    CREATE TABLE data (param INTEGER REFERENCES param(id),
+                       sta INTEGER REFERENCES sta(id),
+                       date INTEGER REFERENCES cal(id), value REAL);
+"""
+
+_units = [('µg/m³', 'ug/m3', 'microgram per cubic meter', r'$\mu g/m^3$'),
+          ('mg/m³', 'mg/m3', 'milligram per cubic meter', r'$mg/m^3$')]
+
+# name, long name, unit id, mean value
+_params = [('pm10', 'Particulate Matter 10', 1, 50.0),
+           ('pm25', 'Particulate Matter 2.5', 1, 25.0),
+           ('so2', 'Sulfur Dioxide', 1, 10.0),
+           ('no2', 'Nitrogen Dioxide', 1, 30.0),
+           ('o3', 'Ozone', 1, 60.0),
+           ('co', 'Carbon Monoxide', 2, 1.0),
+           ('no', 'Nitrogen Monoxide', 1, 15.0),
+           ('nox', 'Nitrogen Oxides', 1, 45.0)]
+
+
+def _names(prefix, n):
+    """Get names and Turkish names of n rows."""
+    nametr = [f'{prefix} {i}' for i in range(1, n + 1)]
+    return _to_ascii(nametr), nametr
+
+
+def calendar(start_year, years):
+    """
+    Create rows of cal table.
+
+    Args:
+        start_year (int): First year
+        years      (int): Number of years
+    Return (list):
+        List of (id, date, year, month, day, hour, week, doy, hoy) tuples
+    """
+    d = _pd.date_range(f'{start_year}-01-01', f'{start_year + years}-01-01',
+                       freq='h', inclusive='left')
+    doy = d.dayofyear.values
+    cols = [_np.arange(1, len(d) + 1), d.strftime('%Y-%m-%d %H:%M:%S'),
+            d.year.values, d.month.values, d.day.values, d.hour.values,
+            d.isocalendar().week.values, doy,
+            (doy - 1) * 24 + d.hour.values + 1]
+    return list(zip(*(_np.asarray(c).tolist() for c in cols)))
+
+
+def create(name, n_sta=10, n_param=3, years=1, missing=0.1, measured=1.0,
+           n_city=None, n_reg=None, start_year=2015, seed=0, db_path=None,
+           indexes=True, overwrite=False):
+    """
+    Create a synthetic database.
+
+    Hourly values of each measured (param, sta) pair follow a daily cycle
+    with random noise. Missing values are not stored in data table as in
+    installed databases. Same arguments create the same database.
+
+    Args:
+        name       (str)  : Database name without extension
+        n_sta      (int)  : Number of stations
+        n_param    (int)  : Number of parameters
+        years      (int)  : Number of years of hourly data
+        missing    (float): Ratio of missing hourly values
+        measured   (float): Ratio of measured (param, sta) pairs
+        n_city     (int)  : Number of cities. Default is n_sta / 4.
+        n_reg      (int)  : Number of regions. Default is n_city / 4.
+        start_year (int)  : First year of data
+        seed       (int)  : Seed of random number generator
+        db_path    (str)  : Directory of database. Default is
+                            options.db_path.
+        indexes    (bool) : Create recommended indexes
+        overwrite  (bool) : Overwrite database if exists
+    Return (str):
+        Path to database file
+    """
+    if n_sta < 1 or n_param < 1 or years < 1:
+        raise ValueError('n_sta, n_param and years must be positive')
+    if not 0 <= missing < 1 or not 0 < measured <= 1:
+        raise ValueError('missing must be in [0, 1) and measured in (0, 1]')
+    if db_path is None:
+        db_path = _Options().db_path
+    path = _path.join(db_path, name + '.db')
+    if _path.exists(path):
+        if not overwrite:
+            raise FileExistsError(f"Database '{path}' already exists.")
+        _os.remove(path)
+    n_city = max(1, n_sta // 4) if n_city is None else n_city
+    n_reg = max(1, n_city // 4) if n_reg is None else n_reg
+    rng = _np.random.default_rng(seed)
+
+    params = [_params[i] if i < len(_params) else
+              (f'p{i + 1}', f'Parameter {i + 1}', 1, 10.0)
+              for i in range(n_param)]
+    reg = _names('Bölge', n_reg)
+    city = _names('Şehir', n_city)
+    sta = _names('İstasyon', n_sta)
+    # coordinates in bounds of Turkey
+    lat = rng.uniform(36, 42, n_reg + n_city + n_sta).round(4).tolist()
+    lon = rng.uniform(26, 45, n_reg + n_city + n_sta).round(4).tolist()
+    cal = calendar(start_year, years)
+    hour = _np.array([r[5] for r in cal])
+    date_ids = _np.arange(1, len(cal) + 1)
+    pairs = [(p, s) for p in range(1, n_param + 1)
+             for s in range(1, n_sta + 1) if rng.random() < measured]
+
+    with _closing(_sq.connect(path)) as con:
+        with con:
+            con.executescript(_schema)
+            con.execute('INSERT INTO version VALUES (?)', ('0.3',))
+            con.executemany('INSERT INTO unit VALUES (?, ?, ?, ?, ?)',
+                            [(i + 1,) + u for i, u in enumerate(_units)])
+            con.executemany('INSERT INTO param VALUES (?, ?, ?, ?)',
+                            [(i + 1,) + p[:3] for i, p in enumerate(params)])
+            con.executemany(
+                'INSERT INTO reg VALUES (?, ?, ?, ?, ?)',
+                [(i + 1, reg[0][i], reg[1][i], lat[i], lon[i])
+                 for i in range(n_reg)])
+            con.executemany(
+                'INSERT INTO city VALUES (?, ?, ?, ?, ?, ?)',
+                [(i + 1, city[0][i], city[1][i], i % n_reg + 1,
+                  lat[n_reg + i], lon[n_reg + i]) for i in range(n_city)])
+            k = n_reg + n_city
+            con.executemany(
+                'INSERT INTO sta VALUES (?, ?, ?, ?, ?, ?)',
+                [(i + 1, sta[0][i], sta[1][i], i % n_city + 1,
+                  lat[k + i], lon[k + i]) for i in range(n_sta)])
+            con.executemany(
+                'INSERT INTO cal VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', cal)
+            con.executemany('INSERT INTO measurement VALUES (?, ?, 1)',
+                            pairs)
+            cycle = 1 + 0.3 * _np.sin(2 * _np.pi * (hour - 9) / 24)
+            for p, s in pairs:
+                mean = params[p - 1][3]
+                values = mean * cycle * rng.lognormal(0, 0.4, len(cal))
+                keep = rng.random(len(cal)) >= missing
+                con.executemany(
+                    f'INSERT INTO data VALUES ({p}, {s}, ?, ?)',
+                    zip(date_ids[keep].tolist(),
+                        values[keep].round(2).tolist()))
+        if indexes:
+            from . import Database  # pylint: disable=C0415
+            Database._create_indexes(con)  # pylint: disable=W0212
+    return path
@@ -7,9 +7,17 @@ This module contains utils to help Database class.
 
 # pylint: disable=C0103, C0201
 from collections import defaultdict as _defaultdict
+from itertools import count as _count
+import operator as _operator
+import numpy as _np
+import pandas as _pd
 import xarray as _xr
 
 
+_ops = {'>=': _operator.ge, '<=': _operator.le,
+        '>': _operator.gt, '<': _operator.lt}
+
+
 def to_ascii(s):
     """
     Convert chars to ascii counterparts.
@@ -39,6 +47,16 @@ def split_str(x):
     return x
 
 
+def tolist(x):
+    """Convert a numpy array or Categorical to a list of python objects."""
+    if isinstance(x, _pd.Categorical) and x.codes.min(initial=0) >= 0:
+        # labels are looked up by codes instead of converting each row
+        return _np.asarray(x.categories, dtype=object)[x.codes].tolist()
+    if isinstance(x, (_np.ndarray, _pd.Categorical)):
+        return x.tolist()
+    return x
+
+
 def split(x, f):
     """
     R-style split function.
@@ -55,36 +73,82 @@ def split(x, f):
     return res
 
 
-def concat(x, dim_names, recursive=True):
-    """Concat xarray objects."""
-    if len(dim_names) != len(list(x.keys())[0]):
-        msg = "length of x.keys() must be equal to length of dim_names"
-        raise ValueError(msg)
+def get_cmp(val):
+    """
+    Get comparison operator and value from a string.
+
+    Args:
+        val (str): A value optionally starting with >=, <=, > or <
+    Return (tuple):
+        Operator and value. Operator is '=' if val has no operator.
+    """
+    ops = ('>=', '<=', '>', '<')
+    for o in ops:
+        if val.startswith(o):
+            return o, val[len(o):]
+    return '=', val
+
 
-    g2 = list(set(i[:-1] for i in x.keys()))
-    g2 = [i[0] if len(i) == 1 else i for i in g2]
-    doms = {i: [] for i in g2}
-    for k in doms:
-        for k2, d2 in x.items():
-            k2 = k2[:-1]
-            if isinstance(k2, tuple):
-                if len(k2) == 1:
-                    k2 = k2[0]
-            if k == k2:
-                doms[k].append(d2)
+def where_mask(cols, where, sorted_cols=()):
+    """
+    Evaluate a where query on numpy columns.
 
-    # combine by last dim
-    doms = {k: _xr.concat(v, dim_names[-1]) if len(doms[k]) > 1 else v[0]
-            for k, v in doms.items()}
+    Values are interpreted as in Build.where2, so the result is the same
+    as running the query built by Build on a table of these columns.
 
-    if recursive:
-        k = list(doms.keys())[0]
-        if not isinstance(k, str):
-            if len(k) > 1:
-                if len(doms) > 1:
-                    return concat(doms, dim_names[:-1])
+    Args:
+        cols (dict): A dict of numpy arrays of equal length
+        where (dict): A dict object contains key-value pairs as in
+                      Build.where2
+        sorted_cols (tuple): Names of columns sorted in ascending order.
+                             Comparisons on these columns are resolved by
+                             binary search.
+    Return (numpy.ndarray):
+        Boolean mask of matching rows
+    """
 
-    return doms
+    def _cast_(col, v):
+        v = to_ascii(str(v)).lower()
+        if col.dtype.kind in 'iuf':
+            return int(v) if v.isnumeric() else float('NaN')
+        return v
+
+    def _mask_(col, val, is_sorted):
+        if isinstance(val, str):
+            if ',' in val:
+                return _mask_(col, val.split(','), is_sorted)
+            cmp, val = get_cmp(val)
+            val = _cast_(col, val)
+            if cmp == '=':
+                return col == val
+            if not is_sorted:
+                return _ops[cmp](col, val)
+            mask = _np.zeros(len(col), dtype=bool)
+            side = 'left' if cmp in ('>=', '<') else 'right'
+            i = _np.searchsorted(col, val, side=side)
+            if cmp.startswith('>'):
+                mask[i:] = True
+            else:
+                mask[:i] = True
+            return mask
+        if isinstance(val, list):
+            if all(isinstance(v, str) for v in val):
+                if all(v.startswith(('>', '<')) for v in val):
+                    return _np.logical_and.reduce(
+                        [_mask_(col, v, is_sorted) for v in val])
+                return _np.isin(col, [_cast_(col, v) for v in val])
+            if all(isinstance(v, list) for v in val):
+                return _np.logical_or.reduce(
+                    [(col >= v[0]) & (col <= v[1]) for v in val])
+            return _np.isin(col, val)
+        return col == val
+
+    n = len(next(iter(cols.values())))
+    mask = _np.ones(n, dtype=bool)
+    for k, v in where.items():
+        if len(str(v)) > 0 and str(v) != '[]':
+            mask &= _mask_(cols[k], v, k in sorted_cols)
+    return mask
 
 
 def int2str(x, keys=None):
@@ -168,12 +232,412 @@ def check_is_empty_or_none(args):
             raise ValueError(f"{k} cannot be empty or None")
 
 
+class Columns(dict):
+    """
+    Columnar query result.
+
+    A dict of numpy arrays keyed by column names. Categorical columns are
+    kept as integer codes and their labels are in categories attribute.
+    A code of -1 denotes a missing label.
+    """
+
+    def __init__(self, *args, categories=None, **kwargs):
+        """
+        Create a Columns object.
+
+        Args:
+            categories (dict): Labels of categorical columns
+        """
+        super().__init__(*args, **kwargs)
+        self.categories = {} if categories is None else categories
+
+    def copy(self):
+        """Deep copy of columns."""
+        return Columns(((k, v.copy()) for k, v in self.items()),
+                       categories={k: v.copy()
+                                   for k, v in self.categories.items()})
+
+    def decode(self, name):
+        """
+        Get labels of a column.
+
+        Args:
+            name (str): Column name
+        Return (numpy.ndarray):
+            Labels for categorical columns, column itself for others.
+        """
+        if name in self.categories:
+            labels = _np.append(self.categories[name], None)
+            return labels[self[name]]
+        return self[name]
+
+
+def to_columns(batches, names, dtypes, size=65536, categories=None):
+    """
+    Fill typed column arrays from column batches.
+
+    Arrays are preallocated and grown geometrically while batches are
+    consumed, so rows are never materialized as Python lists. Categorical
+    columns of batches can be labels or pandas.Categorical. All categories
+    of pandas.Categorical columns are kept in their order, so that results
+    and chunks of a database share categories of catalog, and codes are
+    remapped once per dtype without hashing labels.
+
+    Args:
+        batches (iterable): Iterable of lists of columns in order of names
+        names (list): Column names
+        dtypes (dict): numpy dtype for each name. None means categorical.
+        size (int): Initial capacity of arrays
+        categories (dict): CategoricalDtype of categorical columns, whose
+                           categories are kept even if result is empty
+    Return (Columns):
+        Columnar result
+    """
+    dtypes = [dtypes[k] or _np.int32 for k in names]
+    lookup = {k: {} for k, t in zip(names, dtypes) if t is _np.int32}
+    remaps = {k: (None, None) for k in lookup}
+    for k, dtype in (categories or {}).items():
+        if k in lookup:
+            remaps[k] = dtype, _np.append(
+                _np.arange(len(dtype.categories), dtype=_np.int32), -1)
+            lookup[k].update(zip(dtype.categories, remaps[k][1][:-1]))
+    arrays = [_np.empty(size, dtype=t) for t in dtypes]
+    n = 0
+    for batch in batches:
+        m = len(batch[0])
+        if n + m > len(arrays[0]):
+            cap = max(2 * len(arrays[0]), n + m)
+            for i, a in enumerate(arrays):
+                arrays[i] = _np.empty(cap, dtype=a.dtype)
+                arrays[i][:n] = a[:n]
+        for k, a, c in zip(names, arrays, batch):
+            if k in lookup:
+                d = lookup[k]
+                if isinstance(c, _pd.Categorical):
+                    codes = c.codes
+                    dtype, g = remaps[k]
+                    if dtype is not c.dtype and dtype != c.dtype:
+                        dtype = c.dtype
+                        g = _np.array([d.setdefault(u, len(d))
+                                       for u in dtype.categories] + [-1],
+                                      dtype=_np.int32)
+                        remaps[k] = dtype, g
+                else:
+                    codes, uniques = _pd.factorize(
+                        _np.asarray(c, dtype=object))
+                    g = _np.array([d.setdefault(u, len(d)) for u in uniques]
+                                  + [-1], dtype=_np.int32)
+                a[n:n + m] = g[codes]
+            else:
+                a[n:n + m] = _np.asarray(c, dtype=a.dtype)
+        n += m
+    categories = {k: _np.array(list(v), dtype=object)
+                  for k, v in lookup.items()}
+    return Columns(((k, a[:n].copy()) for k, a in zip(names, arrays)),
+                   categories=categories)
+
+
+class Percentile:
+    """
+    sqlite aggregate function of percentile.
+
+    Percentile is interpolated linearly as in numpy.percentile.
+    NULL values are ignored.
+    """
+
+    def __init__(self):
+        """Create a Percentile object."""
+        self.values = []
+        self.q = None
+
+    def step(self, value, q):
+        """Add a value."""
+        self.q = q
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        """Percentile of values or None if there is no value."""
+        if len(self.values) == 0:
+            return None
+        return float(_np.percentile(self.values, self.q))
+
+
+def rechunk(batches, size):
+    """
+    Regroup column batches into chunks of size rows.
+
+    Args:
+        batches (iterable): Iterable of lists of columns
+        size (int): Number of rows in a chunk. Last chunk can be smaller.
+    Return (generator):
+        Generator of lists of column batches with size rows in total
+    """
+    chunk, n = [], 0
+    for batch in batches:
+        m, start = len(batch[0]), 0
+        while start < m:
+            k = min(size - n, m - start)
+            chunk.append([c[start:start + k] for c in batch])
+            n, start = n + k, start + k
+            if n == size:
+                yield chunk
+                chunk, n = [], 0
+    if n > 0:
+        yield chunk
+
+
+def concat_columns(parts):
+    """
+    Concatenate columnar results in order.
+
+    Codes of categorical columns are remapped to merged categories.
+
+    Args:
+        parts (list): List of Columns objects with same column names
+    Return (Columns):
+        Columnar result
+    """
+    parts = list(parts)
+    categories = {}
+    cols = {k: [] for k in parts[0]}
+    for p in parts:
+        for k, v in p.items():
+            if k in p.categories:
+                d = categories.setdefault(k, {})
+                g = [d.setdefault(u, len(d)) for u in p.categories[k]]
+                v = _np.array(g + [-1], dtype=v.dtype)[v]
+            cols[k].append(v)
+    categories = {k: _np.array(list(v), dtype=object)
+                  for k, v in categories.items()}
+    return Columns(((k, _np.concatenate(v)) for k, v in cols.items()),
+                   categories=categories)
+
+
+def partition_ids(param_ids, sta_ids, n):
+    """
+    Split param and sta ids into about n ordered partitions.
+
+    Partitions are groups of params with all stations or a single param
+    with a range of stations, so that concatenated results of partitions
+    are in (param, sta) order.
+
+    Args:
+        param_ids (list): Sorted param ids
+        sta_ids   (list): Sorted sta ids
+        n         (int) : Number of partitions
+    Return (list):
+        List of (param ids, sta ids) tuples
+    """
+    if len(param_ids) >= n:
+        return [(p.tolist(), list(sta_ids))
+                for p in _np.array_split(_np.asarray(param_ids), n)]
+    k = min(-(-n // len(param_ids)), len(sta_ids))
+    return [([p], s.tolist()) for p in param_ids
+            for s in _np.array_split(_np.asarray(sta_ids), k)]
+
+
+def _factorize(x, categories=None):
+    """Get integer codes and sorted labels of x."""
+    if categories is None:
+        x, categories = _pd.factorize(_np.asarray(x))
+    else:
+        # unused categories are not coordinates
+        used, x = _np.unique(x, return_inverse=True)
+        categories = _np.asarray(categories, dtype=object)[used]
+    labels = _np.asarray(categories.tolist())
+    order = _np.argsort(labels, kind='stable')
+    rank = _np.empty_like(order)
+    rank[order] = _np.arange(len(order))
+    return rank[x], labels[order]
+
+
+def to_xarray(cols, db_name, param_to_variable=False):
+    """
+    Convert columnar query result to xarray.
+
+    Full (param, ..., sta, date) array is allocated once and values are
+    scattered into it by integer indices of each dimension. Station
+    attributes are attached as vectorized coordinates on 'sta'.
+
+    Args:
+        cols (Columns): Columnar result of query
+        db_name (str): Name of DataArray
+        param_to_variable (bool): Return a Dataset where each parameter is
+                                  a variable.
+    Return (DataArray, Dataset):
+        xarray result of query
+    """
+    if len(cols['value']) == 0:
+        return _xr.DataArray([], dims=['date'])
+
+    dims = [k for k in cols if k not in ['date', 'value', 'lat', 'lon']]
+    codes, coords = {}, {}
+    for d in dims:
+        codes[d], coords[d] = _factorize(cols[d], cols.categories.get(d))
+    coords['date'], date_codes = _np.unique(
+        _np.asarray(cols['date'], dtype='datetime64[ns]'),
+        return_inverse=True)
+
+    shape = [len(coords[d]) for d in dims]
+    index = tuple(codes[d] for d in dims)
+    data = _np.full(shape + [len(coords['date'])], _np.nan)
+    data[index + (date_codes.ravel(),)] = cols['value']
+    has_measurement = _np.zeros(shape, dtype=bool)
+    has_measurement[index] = True
+
+    # first row of each station
+    _, first = _np.unique(codes['sta'], return_index=True)
+    for j in ['lat', 'lon']:
+        if j in cols:
+            coords[j] = ('sta', _np.asarray(cols[j], dtype=float)[first])
+    if 'city' in dims:
+        city = coords['city'][codes['city'][first]]
+        coords['sta_long'] = ('sta', _np.array(
+            [" - ".join([c.title(), s.title()])
+             for c, s in zip(city, coords['sta'])], dtype=object))
+
+    return build_xarray(data, dims + ['date'], coords, has_measurement,
+                        db_name, param_to_variable)
+
+
+def build_xarray(data, dims, coords, has_measurement, db_name,
+                 param_to_variable=False):
+    """
+    Build xarray object from a data cube and its coordinates.
+
+    Args:
+        data (numpy.ndarray, dask.array.Array): Data cube
+        dims (list): Dimension names of data. Last one is date.
+        coords (dict): Coordinates
+        has_measurement (numpy.ndarray): Boolean array of dims except date
+        db_name (str): Name of DataArray
+        param_to_variable (bool): Return a Dataset where each parameter is
+                                  a variable.
+    Return (DataArray, Dataset):
+        xarray object
+    """
+    dims = list(dims)
+    if param_to_variable:
+        axis = dims.index('param')
+        dims.remove('param')
+        coords['has_measurement'] = (dims[:-1],
+                                     has_measurement.any(axis=axis))
+        params = coords.pop('param')
+        return _xr.Dataset(
+            {p: (dims, _np.take(data, i, axis=axis))
+             for i, p in enumerate(params)}, coords=coords)
+
+    coords['has_measurement'] = (dims[:-1], has_measurement)
+    return _xr.DataArray(data, dims=dims, coords=coords, name=db_name)
+
+
+def end_points(x):
+    """
+    Get end points of runs of consecutive integers.
+
+    Args:
+        x (numpy.ndarray): Sorted integers
+    Return (list):
+        List of [first, last] of each run
+    """
+    i = _np.flatnonzero(_np.diff(x) != 1)
+    return _np.column_stack([_np.append(x[0], x[i + 1]),
+                             _np.append(x[i], x[-1])]).tolist()
+
+
+def union_ranges(ranges):
+    """
+    Merge overlapping and adjacent ranges of integers.
+
+    Args:
+        ranges (list): List of [first, last] ranges. Empty ranges where
+                       first > last are dropped.
+    Return (list):
+        Sorted list of disjoint [first, last] ranges
+    """
+    ret = []
+    for lo, hi in sorted(r for r in ranges if r[0] <= r[1]):
+        if len(ret) > 0 and lo <= ret[-1][1] + 1:
+            ret[-1][1] = max(ret[-1][1], hi)
+        else:
+            ret.append([lo, hi])
+    return ret
+
+
+def in_ranges(x, ranges):
+    """
+    Test integers for membership in ranges.
+
+    Args:
+        x      (numpy.ndarray): Integers
+        ranges (list): Sorted list of disjoint [first, last] ranges
+    Return (numpy.ndarray):
+        Boolean mask of x
+    """
+    if len(ranges) == 0:
+        return _np.zeros(len(x), dtype=bool)
+    lo, hi = _np.asarray(ranges, dtype=_np.int64).T
+    i = _np.searchsorted(lo, x, side='right') - 1
+    return (i >= 0) & (x <= hi[_np.maximum(i, 0)])
+
+
+def to_frame(cols):
+    """
+    Convert columnar query result to a DataFrame.
+
+    Categorical columns are pandas.Categorical on integer codes of cols,
+    so labels are not repeated on each row.
+
+    Args:
+        cols (Columns): Columnar result of query
+    Return (DataFrame):
+        DataFrame of columns
+    """
+    return _pd.DataFrame(
+        {k: _pd.Categorical.from_codes(v, categories=cols.categories[k])
+         if k in cols.categories else v for k, v in cols.items()})
+
+
+def to_arrow(cols, batch=False):
+    """
+    Convert columnar query result to Apache Arrow.
+
+    Categorical columns are dictionary-encoded on their integer codes
+    and labels, and date is a timestamp column. Numeric arrays are shared
+    with cols without copying. Missing values are NaN as in other return
+    types. Requires pyarrow.
+
+    Args:
+        cols (Columns): Columnar result of query
+        batch (bool): Return a RecordBatch instead of a Table
+    Return (Table, RecordBatch):
+        Arrow result of query
+    """
+    import pyarrow as pa  # pylint: disable=C0415
+
+    arrays = []
+    for k, v in cols.items():
+        if k in cols.categories:
+            labels = pa.array(cols.categories[k].tolist(), type=pa.string())
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(v, mask=v < 0), labels))
+        else:
+            arrays.append(pa.array(v))
+    f = pa.RecordBatch.from_arrays if batch else pa.Table.from_arrays
+    return f(arrays, names=list(cols))
+
+
 def long_to_xarray(q, dim_names, db_name, param_to_variable=False):
     """
     Convert long list query result to xarray.
 
     Args:
         q (list): Long-list result of query
+        dim_names (list): Column names of q
+        db_name (str): Name of DataArray
+        param_to_variable (bool): Return a Dataset where each parameter is
+                                  a variable.
     Return (xarray):
         Combined xarray result of query
     """
@@ -187,65 +651,7 @@ def long_to_xarray(q, dim_names, db_name, param_to_variable=False):
         msg = "length of q must be equal to length of dim_names."
         raise ValueError(msg)
 
-    for d in ['date', 'value']:
-        dim_names.remove(d)
-
-    def _ts_to_xr(k, v):
-        coords = dict(zip(dim_names, [[i] for i in k]))
-
-        if 'sta' in coords.keys():
-            for j in ['lat', 'lon']:
-                if j in coords.keys():
-                    if coords[j][0] is None:
-                        coords[j] = [float('NaN')]
-                    coords[j] = ('sta', coords[j])
-            if 'city' in coords.keys():
-                sta_long = [j[0] for i, j in coords.items()
-                            if i in ['city', 'sta']]
-                sta_long = [i.title() for i in sta_long]
-                sta_long = " - ".join(sta_long)
-                coords['sta_long'] = ('sta', [sta_long])
-            coords['has_measurement'] = ('sta', [True])
-
-        dims = [i for i in coords if i not in
-                ['lat', 'lon', 'sta_long', 'has_measurement']]
-
-        v = list(map(list, zip(*v)))
-        obs = _xr.DataArray(v[1], dims=['date'],
-                            coords={'date': (('date'), v[0])})
-        obs = obs.expand_dims(dict(zip(dims, [1] * len(dims))))
-
-        obs = obs.assign_coords(coords)
-        return obs
-
-    x = split(list(map(list, zip(*q[-2:]))),
-              list(map(tuple, zip(*q[:(len(q) - 2)]))))
-    ll = {k: _ts_to_xr(k, v) for k, v in x.items()}
-
-    if len(ll) > 0:
-        x2 = concat(ll, dim_names)
-
-        # TODO: Re-order coordinates
-
-        xarr = x2.copy()
-        for k, xa in xarr.items():
-            xa.name = xa.coords['param'].values.tolist()[0]
-
-        if param_to_variable:
-            for k, v in xarr.items():
-                v.name = v.coords['param'].values.tolist()[0]
-                xarr[k] = v[0].drop('param')
-            da = _xr.merge(list(xarr.values()), compat='override')
-        else:
-            da = _xr.concat(xarr.values(), dim='param')
-            da.name = db_name
-
-        if 'has_measurement' in da.coords.keys():
-            da.coords['has_measurement'].values = da.coords['has_measurement'] == 1
-
-        return da
-
-    return None
+    return to_xarray(Columns(zip(dim_names, q)), db_name, param_to_variable)
 
 
 class Build:
@@ -255,6 +661,48 @@ class Build:
         """Instantiate a new instance."""
         raise NotImplementedError("You cannot instantiate this class")
 
+    # Maximum number of bound parameters in a single IN list or a set of
+    # ranges. Larger sets of integers are written into the statement.
+    max_variables = 999
+
+    # suffix of temporary table names, unique in a process
+    _temp_count = _count()
+
+    @staticmethod
+    def pad(values):
+        """
+        Pad a list to the next power of two by repeating its last item.
+
+        Padded lists keep the shape of generated statements stable, so
+        queries with a similar number of values reuse prepared statements.
+
+        Args:
+            values (list): A list of values
+        Return (list):
+            Padded list
+        """
+        n = len(values)
+        if n == 0:
+            return values
+        return values + [values[-1]] * ((1 << (n - 1).bit_length()) - n)
+
+    @staticmethod
+    def where_in(var, values):
+        """
+        Build an IN statement with placeholders.
+
+        Args:
+            var (str): Name of variable
+            values (list): Values of variable
+        Return (tuple):
+            IN statement and a list of parameters
+        """
+        padded = Build.pad(list(values))
+        if len(padded) > Build.max_variables and \
+                all(isinstance(i, int) for i in values):
+            return var + ' IN (' + ','.join(map(str, values)) + ')', []
+        return var + ' IN (' + ','.join('?' * len(padded)) + ')', padded
+
     @staticmethod
     def where_like(query):
         """
@@ -263,86 +711,65 @@ class Build:
         Args:
             query (dict): A dict object contains key-value pairs to construct
                           a WHERE query
-        Return: (str):
-            WHERE query
+        Return: (tuple):
+            WHERE query with placeholders and a list of parameters
         """
         sql = ''
+        params = []
         where_clauses = []
-        if any(v is not None and v != '' for v in query.values()):
-            where_clauses = []
-            for k, v in query.items():
-                if v is not None:
-                    if isinstance(v, list):
-                        where_clauses += [
-                            '(' + ' OR '.join(
-                                f"{k} LIKE '{i.lower()}'"
-                                for i in v if i != '' and i is not None) + ')']
-                    else:
-                        if isinstance(v, str) and v:
-                            where_clauses += [f"({k} LIKE '{v.lower()}')"]
+        for k, v in query.items():
+            if isinstance(v, list):
+                v = [i.lower() for i in v if i != '' and i is not None]
+                if len(v) > 0:
+                    where_clauses += [
+                        '(' + ' OR '.join(f"{k} LIKE ?" for _ in v) + ')']
+                    params += v
+            elif isinstance(v, str) and v:
+                where_clauses += [f"({k} LIKE ?)"]
+                params += [v.lower()]
         if len(where_clauses) > 0:
-            if any(v is not None and v != '' for v in where_clauses):
-                sql += ' WHERE ' + ' AND '.join(where_clauses)
-        return sql
+            sql += ' WHERE ' + ' AND '.join(where_clauses)
+        return sql, params
 
     @staticmethod
-    def where(var, val):  # pylint: disable=R0912
+    def where(var, val):  # pylint: disable=R0911
         """
         Build where part of the query.
 
         Args:
             var (str): Name of variable
             val (str, list, list of list): Value of variable
-        Return (str):
-            A where statement for query
+        Return (tuple):
+            A where statement with placeholders and a list of parameters
         """
 
-        def _get_cmp_(val):
-            """Get comparison values as tuple."""
-            ops = ('>=', '<=', '>', '<')
-            if val.startswith(ops):
-                for o in ops:
-                    if val.startswith(o):
-                        cmp = o
-                        val = val[len(cmp):]
-                        break
-            else:
-                cmp = '='
-            return cmp, val
+        def _join_(clauses, op):
+            return ('(' + op.join(c[0] for c in clauses) + ')',
+                    [p for c in clauses for p in c[1]])
 
-        ret = ''
         if isinstance(val, str):
             if ',' in val:
-                ret = Build.where(var, val.split(','))
-            else:
-                cmp, val = _get_cmp_(val)
-                val = to_ascii(val).lower()
-                if not val.isnumeric():
-                    val = '\'' + val + '\''
-                ret = cmp.join([var, val])
-        elif isinstance(val, list):
+                return Build.where(var, val.split(','))
+            cmp, val = get_cmp(val)
+            val = to_ascii(val).lower()
+            return var + cmp + '?', [int(val) if val.isnumeric() else val]
+        if isinstance(val, list):
             if all(isinstance(v, str) for v in val):  # all is str
                 if all(v.startswith(('>', '<')) for v in val):
-                    ret = ' AND '.join(
-                        [Build.where(var, v) for v in val])
-                    ret = '(' + ret + ')'
-                else:
-                    ret = var + ' IN (' + \
-                          ','.join(['\'' + to_ascii(str(i)).lower() + '\''
-                                   for i in val]) + ')'
-            elif all(isinstance(v, list) for v in val):  # all is list
-                val = [['>=' + str(v[0]), '<=' + str(v[1])] for v in val]
-                ret = '(' + ' OR '.join(
-                    [Build.where(var, v) for v in val]) + ')'
-
-            if ret == '':
-                if len(val) > 1:
-                    ret = var + ' IN (' + ','.join([str(i) for i in val]) + ')'
-                else:
-                    ret = var + ' = ' + str(val[0])
-        else:
-            ret = var + ' = ' + str(val)
-        return ret
+                    return _join_([Build.where(var, v) for v in val], ' AND ')
+                return Build.where_in(
+                    var, [to_ascii(str(i)).lower() for i in val])
+            if all(isinstance(v, list) for v in val):  # all is list
+                padded = Build.pad(val)
+                rng = f'({var}>=? AND {var}<=?)'
+                if 2 * len(padded) > Build.max_variables:
+                    return _join_([(rng.replace('?', '{}').format(*v), [])
+                                   for v in val], ' OR ')
+                return _join_([(rng, list(v)) for v in padded], ' OR ')
+            if len(val) > 1:
+                return Build.where_in(var, val)
+            return var + ' = ?', [val[0]]
+        return var + ' = ?', [val]
 
     @staticmethod
     def where2(args):
@@ -352,21 +779,19 @@ class Build:
         Args:
             args (dict): A dict object contains key-value pairs to construct
                          a WHERE query
-        Return: (str):
-            WHERE query
+        Return: (tuple):
+            WHERE query with placeholders and a list of parameters
         """
-        where = args.copy()
-        where = {k: v for k, v in where.items()
+        where = {k: v for k, v in args.items()
                  if len(str(v)) > 0 and str(v) != '[]'}
-
-        where = ' AND '.join(
-            [Build.where(k, v) for k, v in where.items() if v != ''])
-        if where != '':
-            where = ' WHERE ' + where
-        return where
+        clauses = [Build.where(k, v) for k, v in where.items() if v != '']
+        sql = ' AND '.join(c[0] for c in clauses)
+        if sql != '':
+            sql = ' WHERE ' + sql
+        return sql, [p for c in clauses for p in c[1]]
 
     @staticmethod
-    def select(value, where, table):
+    def select(value, where, table, temp=None):
         """
         Create a select statement for a table.
 
@@ -375,7 +800,10 @@ class Build:
                 string of list or a comma sepereated values as string.
             where (dict): A dictionary of key:value of where statements
             table (str: Name of table in database
-        Return (str): Select query
+            temp  (dict): A dict of variable: temporary table name from
+                temp_tables. These variables are matched by ids in
+                temporary tables instead of where.
+        Return (tuple): Select query with placeholders and its parameters
         """
         if isinstance(value, dict):
             value = ','.join([k for k, v in value.items() if v])
@@ -383,15 +811,48 @@ class Build:
         if isinstance(value, list):
             value = ','.join([str(i) for i in value])
 
-        where = {k: v for k, v in where.items()
-                 if len(str(v)) > 0 and str(v) != '[]'}
+        temp = temp or {}
+        where, params = Build.where2(
+            {k: v for k, v in where.items() if k not in temp})
+        clauses = [f'{k} IN (SELECT id FROM temp.{t})'
+                   for k, t in temp.items()]
+        if len(clauses) > 0:
+            where += (' AND ' if where != '' else ' WHERE ') + \
+                ' AND '.join(clauses)
+        return 'SELECT ' + value + ' FROM ' + table + where, params
+
+    @staticmethod
+    def temp_tables(where, threshold):
+        """
+        Get temporary tables of large id sets of a where dict.
 
-        where = ' AND '.join(
-            [Build.where(k, v) for k, v in where.items() if v != ''])
-        if where != '':
-            where = ' WHERE ' + where
+        Id sets with more than threshold items are moved to temporary
+        tables of a single id column. [first, last] ranges are expanded
+        to ids, so they are matched by index lookups instead of a chain of
+        OR'd comparisons.
 
-        return 'SELECT ' + value + ' FROM ' + table + where
+        Args:
+            where     (dict): A dict of variable: ids or [first, last] ranges
+            threshold (int) : Maximum size of id sets kept in statement.
+                              None does not create any temporary table.
+        Return (tuple):
+            A dict of variable: table name to pass to select and a dict of
+            table name: ids to create before the query is executed
+        """
+        temp, tables = {}, {}
+        if threshold is None:
+            return temp, tables
+        for k, v in where.items():
+            if not isinstance(v, list) or len(v) <= threshold:
+                continue
+            if all(isinstance(i, list) for i in v):
+                v = _np.concatenate(
+                    [_np.arange(lo, hi + 1) for lo, hi in v]).tolist()
+            elif not all(isinstance(i, (int, _np.integer)) for i in v):
+                continue
+            temp[k] = f'airdb_{k}_{next(Build._temp_count)}'
+            tables[temp[k]] = v
+        return temp, tables
 
     @staticmethod
     def select_string(sel, default):
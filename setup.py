@@ -30,6 +30,8 @@ setup(
     package_data={'airdb': ['data/README.md']},
     setup_requires=['pytest-runner'],
     install_requires=['pandas', 'numpy', 'xarray'],
+    extras_require={'parquet': ['pyarrow'], 'arrow': ['pyarrow'],
+                    'lazy': ['dask']},
     tests_require=['pytest'],
     author=get('author'),
     author_email=get('email'),
@@ -44,12 +46,13 @@ setup(
         "Intended Audience :: Science/Research",
         "Operating System :: OS Independent",
         "License :: OSI Approved :: GNU Affero General Public License v3 or later (AGPLv3+)",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
-        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
+        "Programming Language :: Python :: 3.12",
         "Topic :: Utilities",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.9",
     keywords=['data', 'environment', 'pollutant', 'meteorology', 'turkey'],
     url='https://github.com/isezen/air-db',
     download_url='https://pypi.org/project/air-db/#files',
@@ -0,0 +1,48 @@
+"""Fixtures of tests on a synthetic database."""
+
+# pylint: disable=C0103, W0621
+import shutil
+
+import pytest
+
+from airdb import Database, delta, options, synthetic
+
+
+@pytest.fixture(scope='session')
+def db_path(tmp_path_factory):
+    """Directory of a small synthetic database named 'test'."""
+    p = str(tmp_path_factory.mktemp('db'))
+    synthetic.create('test', n_sta=8, n_param=2, years=1, missing=0.2,
+                     measured=0.8, db_path=p)
+    return p
+
+
+@pytest.fixture
+def db(db_path):
+    """Database object of the synthetic database."""
+    snapshot = options.snapshot()
+    options.db_path = db_path
+    with Database('test') as d:
+        yield d
+    options.restore(snapshot)
+
+
+@pytest.fixture(scope='session')
+def delta_path(db_path, tmp_path_factory):
+    """Delta of the second year of the synthetic database."""
+    p = str(tmp_path_factory.mktemp('delta'))
+    new = synthetic.create('new', n_sta=8, n_param=2, years=2, missing=0.2,
+                           measured=0.8, db_path=p)
+    ret = f'{p}/test.delta'
+    delta.diff(f'{db_path}/test.db', new, ret, delta_id='d1')
+    return ret
+
+
+@pytest.fixture
+def db_copy(db_path, tmp_path):
+    """Directory of a copy of the synthetic database to be changed."""
+    shutil.copy(f'{db_path}/test.db', tmp_path)
+    snapshot = options.snapshot()
+    options.db_path = str(tmp_path)
+    yield str(tmp_path)
+    options.restore(snapshot)
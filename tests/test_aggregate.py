@@ -0,0 +1,47 @@
+"""Tests of aggregation of data by time periods."""
+
+# pylint: disable=C0103
+import numpy as np
+import pandas as pd
+import pytest
+
+from airdb import Database
+
+
+@pytest.mark.parametrize('freq', ['D', 'M', 'hour-of-day'])
+def test_aggregate_equals_pandas(db, freq):
+    keys = list(Database._freqs[freq])  # pylint: disable=W0212
+    q = dict(month=[1, 2, 3])
+    ret = db.aggregate(**q, freq=freq, how=['mean', 'max', 'p98'])
+    df = db.query(**q, select='reg', return_type='df', include_nan=False)
+    for k in keys:
+        df[k] = getattr(df['date'].dt, k)
+    g = df.groupby(['param', 'reg', 'city', 'sta'] + keys,
+                   observed=True)['value']
+    ref = pd.DataFrame({
+        'mean': g.mean(), 'max': g.max(),
+        'p98': g.apply(lambda x: np.percentile(x, 98)),
+        'count': g.count()}).reset_index()
+    ref = ref.astype({k: object for k in ('param', 'reg', 'city', 'sta')})
+    ret = ret.sort_values(['param', 'sta'] + keys, ignore_index=True)
+    ref = ref.sort_values(['param', 'sta'] + keys, ignore_index=True)
+    for k in ('param', 'reg', 'city', 'sta'):
+        assert ret[k].tolist() == ref[k].tolist()
+    for k in keys + ['count']:
+        np.testing.assert_array_equal(ret[k], ref[k])
+    for k in ('mean', 'max', 'p98'):
+        np.testing.assert_allclose(ret[k], ref[k])
+
+
+def test_aggregate_hours(db):
+    ret = db.aggregate(month=2, freq='M')
+    # 2015 is the first year of synthetic data
+    assert (ret['hours'] == 28 * 24).all()
+    assert (ret['count'] <= ret['hours']).all()
+
+
+def test_aggregate_errors(db):
+    with pytest.raises(ValueError):
+        db.aggregate(freq='W')
+    with pytest.raises(ValueError):
+        db.aggregate(how='median')
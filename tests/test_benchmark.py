@@ -0,0 +1,21 @@
+"""Tests of the benchmark module."""
+
+# pylint: disable=C0103
+from airdb import benchmark
+
+
+def test_benchmark_cases(db):
+    for case, func in benchmark.cases().items():
+        func(db)
+        # lazy queries fetch rows when computed
+        if case.startswith('query') and 'lazy' not in case:
+            assert db.last_stats.rows > 0
+
+
+def test_benchmark_main(capsys):
+    # peak memory runs under tracemalloc are slow, so only a few cases
+    benchmark.main(['--sta', '3', '--param', '2', '--years', '1',
+                    '--repeat', '1', '--case', 'query-wide',
+                    '--case', 'query-df-nan', '--case', 'fill-nan'])
+    out = capsys.readouterr().out
+    assert 'query-wide' in out and 'fill-nan' in out
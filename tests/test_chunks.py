@@ -0,0 +1,49 @@
+"""Tests of chunked streaming of query results."""
+
+# pylint: disable=C0103
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize('include_nan', [True, False])
+def test_chunks_equal_query(db, include_nan):
+    q = dict(month=[1, 2], include_nan=include_nan)
+    ref = db.query(**q, return_type='df')
+    chunks = list(db.query(**q, return_type='df', chunksize=1000))
+    assert all(len(c) == 1000 for c in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= 1000
+    # chunks share categories of catalog, so concat keeps categoricals
+    ret = pd.concat(chunks, ignore_index=True)
+    for k in ('param', 'city', 'sta'):
+        assert isinstance(ret[k].dtype, pd.CategoricalDtype)
+        assert all(c[k].dtype == ref[k].dtype for c in chunks)
+    assert ret.equals(ref)
+
+
+def test_categories_of_catalog(db):
+    sta = db.sta()['name'].tolist()
+    a = db.query(sta=sta[0], return_type='df')
+    b = db.query(sta=sta[1], return_type='df')
+    empty = db.query(date='2030-01-01', return_type='df')
+    for k in ('param', 'city', 'sta'):
+        assert a[k].dtype == b[k].dtype == empty[k].dtype
+    ret = pd.concat([a, b, empty], ignore_index=True)
+    assert isinstance(ret['sta'].dtype, pd.CategoricalDtype)
+    assert ret['sta'].unique().tolist() == \
+        a['sta'].unique().tolist() + b['sta'].unique().tolist()
+
+
+def test_chunks_numpy(db):
+    ref = db.query(month=1, return_type='numpy')
+    chunks = list(db.query(month=1, return_type='numpy', chunksize=999))
+    for k in ref:
+        np.testing.assert_array_equal(
+            np.concatenate([c.decode(k) for c in chunks]), ref.decode(k))
+
+
+def test_chunks_errors(db):
+    with pytest.raises(ValueError):
+        db.query(chunksize=0, return_type='df')
+    with pytest.raises(ValueError):
+        db.query(chunksize=10, return_type='list')
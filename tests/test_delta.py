@@ -0,0 +1,96 @@
+"""Tests of delta packages applied by Database.update."""
+
+# pylint: disable=C0103
+import sqlite3
+
+import pytest
+
+from airdb import Database, delta
+from airdb.__errors__ import DeltaError
+
+
+def counts(path):
+    """Number of rows of tables changed by deltas."""
+    with sqlite3.connect(path) as con:
+        return {t: con.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+                for t in ('cal', 'data', 'measurement')}
+
+
+def test_apply(db_copy, delta_path):
+    before = counts(f'{db_copy}/test.db')
+    with Database('test') as d:
+        last = d.query(return_type='df')['date'].max()
+        n = d.update(delta_path)
+        after = counts(f'{db_copy}/test.db')
+        # 2016 is a leap year
+        assert n['data'] > 0 and n['cal'] == 8784
+        assert {k: after[k] - before[k] for k in n} == n
+        ret = d.query(return_type='df')
+        assert ret['date'].max().year == last.year + 1
+        assert list(d.deltas()['id']) == ['d1']
+
+
+def test_reapply(db_copy, delta_path):
+    with Database('test') as d:
+        d.update(delta_path)
+        before = counts(f'{db_copy}/test.db')
+        with pytest.raises(DeltaError, match='already applied'):
+            d.update(delta_path)
+        assert counts(f'{db_copy}/test.db') == before
+
+
+def test_version_mismatch(db_copy, tmp_path):
+    p = str(tmp_path / 'v.delta')
+    delta.create(p, '0.1')
+    before = counts(f'{db_copy}/test.db')
+    with Database('test') as d, pytest.raises(DeltaError, match='version'):
+        d.update(p)
+    assert counts(f'{db_copy}/test.db') == before
+
+
+def test_base_mismatch(db_copy, delta_path, tmp_path):
+    p = str(tmp_path / 'b.delta')
+    delta.create(p, '0.3', base='d0')
+    with Database('test') as d:
+        with pytest.raises(DeltaError, match='requires delta'):
+            d.update(p)
+        d.update(delta_path)
+        # the next delta must be based on the last applied one
+        p = str(tmp_path / 'c.delta')
+        delta.create(p, '0.3')
+        with pytest.raises(DeltaError, match='requires delta'):
+            d.update(p)
+        assert list(d.deltas()['id']) == ['d1']
+
+
+def test_rollback(db_copy, delta_path, tmp_path):
+    p = str(tmp_path / 'bad.delta')
+    with open(delta_path, 'rb') as f, open(p, 'wb') as g:
+        g.write(f.read())
+    # cal and data rows are inserted before measurement rows fail
+    with sqlite3.connect(p) as con:
+        con.execute("UPDATE manifest SET value = 'bad' WHERE key = 'id'")
+        con.execute('DROP TABLE measurement')
+        con.execute('CREATE TABLE measurement (param, sta)')
+    before = counts(f'{db_copy}/test.db')
+    with Database('test') as d:
+        with pytest.raises(sqlite3.OperationalError):
+            d.update(p)
+        assert counts(f'{db_copy}/test.db') == before
+        assert len(d.deltas()) == 0
+        d.update(delta_path)
+        assert counts(f'{db_copy}/test.db') != before
+
+
+def test_deltas(db_copy, delta_path, tmp_path):
+    p = str(tmp_path / 'd2.delta')
+    delta.create(p, '0.3', base='d1', new_version='0.4', delta_id='d2')
+    with Database('test') as d:
+        assert d.deltas().empty
+        d.update(delta_path)
+        d.update(p)
+        ret = d.deltas()
+        assert list(ret.columns) == ['id', 'base', 'applied']
+        assert list(ret['id']) == ['d1', 'd2']
+        assert ret['base'].isna()[0] and ret['base'][1] == 'd1'
+        assert d.version == 0.4
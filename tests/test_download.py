@@ -0,0 +1,220 @@
+"""Tests of resumable downloads against a local HTTP server."""
+
+# pylint: disable=C0103, W0621
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+
+import pytest
+
+from airdb import download
+from airdb.__errors__ import ChecksumError
+
+content = os.urandom(3 * download.chunk_size + 1234)
+sha256 = hashlib.sha256(content).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve content with Range requests and configurable faults."""
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        """Do not log requests."""
+
+    def do_GET(self):  # pylint: disable=C0116
+        srv = self.server
+        srv.ranges.append(self.headers.get('Range'))
+        data = srv.files.get(self.path, content)
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        start = 0
+        rng = self.headers.get('Range')
+        if self.headers.get('If-Range', etag) != etag:
+            # file is changed, whole file is sent
+            rng = None
+        if rng is not None and not srv.ignore_range:
+            start = int(rng[len('bytes='):].rstrip('-'))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.end_headers()
+                return
+            sent = start + srv.shift_start
+            self.send_response(206)
+            self.send_header('Content-Range',
+                             f'bytes {sent}-{len(data) - 1}/{len(data)}')
+        else:
+            sent = 0
+            self.send_response(200)
+        body = data[sent:]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if srv.drops > 0:
+            # connection is closed after half of the body
+            srv.drops -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        srv.shift_start = 0
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    """Local HTTP server of content."""
+    srv = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    srv.ranges = []
+    srv.ignore_range = False
+    srv.drops = 0
+    srv.shift_start = 0
+    srv.files = {}
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    srv.url = f'http://127.0.0.1:{srv.server_address[1]}/db.tar.gz'
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    """Do not wait between retries."""
+    monkeypatch.setattr(download._time, 'sleep',  # pylint: disable=W0212
+                        lambda s: None)
+
+
+def read(p):
+    """Read a file."""
+    with open(p, 'rb') as f:
+        return f.read()
+
+
+def target(server, tmp_path):
+    """Path to downloaded file of server url."""
+    return download._target(server.url, str(tmp_path))  # pylint: disable=W0212
+
+
+def write_part(server, tmp_path, data, etag=None):
+    """Write a partial download and its validator."""
+    p = target(server, tmp_path)
+    with open(p + '.part', 'wb') as f:
+        f.write(data)
+    if etag is None:
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+    with open(p + '.validator', 'w', encoding='utf-8') as f:
+        f.write(etag)
+
+
+def test_download(server, tmp_path):
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+    assert server.ranges == [None]
+    assert not path.exists(p + '.part')
+
+
+def test_resume_from_part(server, tmp_path):
+    write_part(server, tmp_path, content[:1000])
+    received = []
+    p = download.download(server.url, str(tmp_path),
+                          checksum='sha256:' + sha256,
+                          progress=lambda n, t: received.append((n, t)))
+    assert read(p) == content
+    assert server.ranges == ['bytes=1000-']
+    assert received[-1] == (len(content), len(content))
+
+
+def test_range_ignored(server, tmp_path):
+    server.ignore_range = True
+    write_part(server, tmp_path, b'x' * 1000)
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+
+
+def test_complete_part(server, tmp_path):
+    write_part(server, tmp_path, content)
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+    assert server.ranges == [f'bytes={len(content)}-']
+
+
+def test_retry_after_dropped_connection(server, tmp_path):
+    server.drops = 2
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+    assert len(server.ranges) == 3
+    assert server.ranges[0] is None
+    assert all(r is not None for r in server.ranges[1:])
+
+
+def test_retries_exhausted(server, tmp_path):
+    server.drops = 3
+    with pytest.raises(OSError):
+        download.download(server.url, str(tmp_path), retries=1)
+    # partial file is kept to resume later
+    assert 0 < path.getsize(target(server, tmp_path) + '.part') < len(content)
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+
+
+def test_wrong_content_range(server, tmp_path):
+    write_part(server, tmp_path, content[:1000])
+    server.shift_start = 10
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+    assert server.ranges == ['bytes=1000-', None]
+
+
+def test_checksum_error(server, tmp_path):
+    with pytest.raises(ChecksumError):
+        download.download(server.url, str(tmp_path), checksum='0' * 64)
+    assert os.listdir(tmp_path) == []
+
+
+def test_existing_file_reused(server, tmp_path):
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert download.download(server.url, str(tmp_path),
+                             checksum=sha256) == p
+    assert len(server.ranges) == 1
+
+
+def test_existing_file_without_checksum(server, tmp_path):
+    download.download(server.url, str(tmp_path))
+    server.files['/db.tar.gz'] = content[::-1]
+    p = download.download(server.url, str(tmp_path))
+    assert read(p) == content[::-1]
+    assert len(server.ranges) == 2
+
+
+def test_same_basename(server, tmp_path):
+    server.files['/v2/db.tar.gz'] = content[::-1]
+    url = server.url.replace('/db.tar.gz', '/v2/db.tar.gz')
+    p1 = download.download(server.url, str(tmp_path))
+    p2 = download.download(url, str(tmp_path))
+    assert p1 != p2
+    assert read(p1) == content and read(p2) == content[::-1]
+
+
+def test_changed_file_not_resumed(server, tmp_path):
+    write_part(server, tmp_path, content[:1000], etag='"old"')
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+    assert server.ranges == ['bytes=1000-']
+
+
+def test_part_without_validator(server, tmp_path):
+    write_part(server, tmp_path, content[:1000])
+    os.remove(target(server, tmp_path) + '.validator')
+    p = download.download(server.url, str(tmp_path), checksum=sha256)
+    assert read(p) == content
+    assert server.ranges == [None]
+    assert os.listdir(tmp_path) == [path.basename(p)]
+
+
+def test_checksum_file(tmp_path):
+    p = tmp_path / 'f'
+    p.write_bytes(content)
+    download.checksum_file(str(p), 'md5:' + hashlib.md5(content).hexdigest())
+    with pytest.raises(ChecksumError):
+        download.checksum_file(str(p), sha256[::-1])
@@ -0,0 +1,83 @@
+"""Tests of the parquet query engine against the sqlite engine."""
+
+# pylint: disable=C0103, W0621
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from airdb import Database, options
+from airdb.__errors__ import StaleMirrorError
+
+pytest.importorskip('pyarrow')
+from airdb import parquet  # noqa: E402 pylint: disable=C0413
+
+
+@pytest.fixture(scope='module')
+def pq(db_path):
+    """Database object of parquet engine."""
+    snapshot = options.snapshot()
+    options.db_path = db_path
+    with Database('test') as d:
+        d.build_parquet_mirror()
+    with Database('test', engine='parquet') as d:
+        yield d
+    options.restore(snapshot)
+
+
+def queries(db):
+    """Queries of various param, sta and date arguments."""
+    sta = db.sta()['name'].tolist()
+    param = db.param()['name'].tolist()
+    return [dict(), dict(param=param[0], sta=sta[:3]),
+            dict(sta=sta[2], date=['>=2015-02-01', '<2015-02-03'],
+                 hour=[7, 8]),
+            dict(month=[3, 12], select='reg,lat,lon,year,hoy'),
+            dict(param=param[0], date='2030-01-01')]
+
+
+@pytest.mark.parametrize('include_nan', [True, False])
+def test_parquet_equals_sqlite(db, pq, include_nan):
+    for q in queries(db):
+        ref = db.query(**q, include_nan=include_nan, return_type='df')
+        ret = pq.query(**q, include_nan=include_nan, return_type='df')
+        # both engines have the same categories of labels
+        assert ret.dtypes.equals(ref.dtypes)
+        assert ret.equals(ref)
+        ref = db.query(**q, include_nan=include_nan, return_type='list')
+        ret = pq.query(**q, include_nan=include_nan, return_type='list')
+        assert pd.DataFrame(ret).equals(pd.DataFrame(ref))
+
+
+def test_parquet_query_many(db, pq):
+    ref = db.query_many(queries(db), return_type='numpy')
+    ret = pq.query_many(queries(db), return_type='numpy')
+    for a, b in zip(ret, ref):
+        for k in b:
+            np.testing.assert_array_equal(a.decode(k), b.decode(k))
+
+
+def test_parquet_workers(pq):
+    with pytest.raises(ValueError):
+        pq.query(workers=2, return_type='df')
+
+
+def test_stale_mirror(db_copy, delta_path, monkeypatch):
+    # rows are written in many batches across years
+    monkeypatch.setattr(parquet, 'batch_size', 1000)
+    with Database('test') as d:
+        d.build_parquet_mirror()
+    with Database('test', engine='parquet') as pq, Database('test') as d:
+        n = len(pq.query(return_type='df'))
+        d.update(delta_path)
+        # mirror of the first year is not used after update
+        with pytest.raises(StaleMirrorError):
+            pq.query(return_type='df')
+        with pytest.raises(StaleMirrorError):
+            Database('test', engine='parquet')
+        pq.build_parquet_mirror()
+        ret = pq.query(return_type='df')
+        assert len(ret) > n
+        assert ret.equals(d.query(return_type='df'))
+    assert sorted(os.listdir(db_copy)) == ['test.db', 'test.parquet']
@@ -0,0 +1,45 @@
+"""Tests of Database objects with a connection pool."""
+
+# pylint: disable=C0103
+import threading
+
+import pytest
+
+from airdb import Database
+from airdb.pool import ConnectionPool
+
+
+def test_partial_generator(db):
+    with Database('test', pool_size=1) as d:
+        g = d.query(month=1, return_type='gen')
+        next(g)
+        # connection of generator cannot be released by waiting
+        with pytest.raises(RuntimeError):
+            d.query(month=1, return_type='df')
+        g.close()
+        assert len(d.query(month=1, return_type='df')) == \
+            len(db.query(month=1, return_type='df'))
+    with Database('test', pool_size=2) as d:
+        g = d.query(month=1, return_type='gen')
+        next(g)
+        assert len(d.query(month=2, return_type='df')) > 0
+        g.close()
+
+
+def test_pool_other_thread(db_path):
+    pool = ConnectionPool(f'{db_path}/test.db', 1, timeout=5)
+    ret = []
+
+    def _borrow():
+        with pool.connection() as con:
+            ret.append(con is not None)
+
+    with pool.connection():
+        t = threading.Thread(target=_borrow)
+        t.start()
+        t.join(0.2)
+        # other threads wait for a free connection
+        assert t.is_alive()
+    t.join()
+    assert ret == [True]
+    pool.close()
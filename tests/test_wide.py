@@ -0,0 +1,34 @@
+"""Tests of wide DataFrame results."""
+
+# pylint: disable=C0103
+import numpy as np
+import pytest
+
+
+def test_wide_equals_pivot(db):
+    sta = db.sta()['name'].tolist()
+    for q in (dict(), dict(param=db.param()['name'][0], sta=sta[:4],
+                           month=[1, 2])):
+        ret = db.query(**q, return_type='wide')
+        df = db.query(**q, return_type='df', include_nan=False)
+        ref = df.pivot_table(index='date', columns=['param', 'sta'],
+                             values='value', observed=True)
+        # dates and measured series without values are NaN in wide
+        assert ret.notna().sum().sum() == len(df)
+        full = db.query(**q, return_type='df')
+        np.testing.assert_array_equal(ret.index.values,
+                                      np.unique(full['date'].values))
+        ret = ret.loc[ref.index, ref.columns.tolist()]
+        np.testing.assert_array_equal(ret.values, ref.values)
+
+
+def test_wide_no_dates(db):
+    ret = db.query(date='2030-01-01', return_type='wide')
+    assert ret.shape[0] == 0
+
+
+def test_wide_errors(db):
+    with pytest.raises(ValueError):
+        db.query(return_type='wide', include_nan=False)
+    with pytest.raises(ValueError):
+        db.query(return_type='wide', select='lat')
@@ -0,0 +1,46 @@
+"""Tests of parallel queries in worker processes."""
+
+# pylint: disable=C0103, W0212, W0621
+import numpy as np
+import pandas as pd
+import pytest
+
+import airdb
+from airdb import options
+
+
+def _worker_pragmas():
+    """PRAGMAs of the database connection of a worker process."""
+    db = airdb._worker_dbs['test'][1]
+    return db._execute('PRAGMA mmap_size')[0][0], \
+        db._execute('PRAGMA cache_size')[0][0]
+
+
+@pytest.mark.parametrize('include_nan', [True, False])
+def test_workers_equal_serial(db, include_nan):
+    sta = db.sta()['name'].tolist()
+    q = dict(sta=sta[:6], month=[1, 2], include_nan=include_nan)
+    ref = db.query(**q, return_type='df')
+    pd.testing.assert_frame_equal(
+        db.query(**q, return_type='df', workers=2), ref)
+    ref = db.query(**q, return_type='numpy')
+    ret = db.query(**q, return_type='numpy', workers=2)
+    assert list(ret) == list(ref)
+    for k in ref:
+        np.testing.assert_array_equal(ret.decode(k), ref.decode(k))
+
+
+def test_workers_options(db):
+    options.mmap_size = 2 ** 20
+    options.page_cache_size = -4096
+    db.query(param=db.param()['name'][0], return_type='df', workers=2)
+    ex = db._processes[1]
+    futures = [ex.submit(_worker_pragmas) for _ in range(4)]
+    assert {f.result() for f in futures} == {(2 ** 20, -4096)}
+
+
+def test_workers_errors(db):
+    with pytest.raises(ValueError):
+        db.query(workers=0)
+    with pytest.raises(ValueError):
+        db.query(workers=2, return_type='gen')
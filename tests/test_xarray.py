@@ -0,0 +1,30 @@
+"""Tests of xarray results."""
+
+# pylint: disable=C0103
+import pytest
+import xarray as xr
+
+pytest.importorskip('dask')
+
+
+@pytest.mark.parametrize('param_to_variable', [False, True])
+def test_lazy_equals_eager(db, param_to_variable):
+    sta = db.sta()['name'].tolist()
+    for q in (dict(), dict(sta=sta[:5], month=[1, 2]),
+              dict(sta=sta[1], date=['>=2015-03-01', '<2015-03-05'])):
+        ref = db.query(**q, return_type='xarray',
+                       param_to_variable=param_to_variable)
+        ret = db.query(**q, return_type='xarray_lazy', sta_chunk=2,
+                       param_to_variable=param_to_variable)
+        xr.testing.assert_equal(ret.compute(), ref)
+
+
+def test_lazy_reads_nothing(db):
+    ret = db.query(return_type='xarray_lazy')
+    assert db.last_stats.rows_fetched == 0
+    assert ret.isel(date=slice(0, 24)).compute().notnull().any()
+
+
+def test_lazy_date_parts(db):
+    with pytest.raises(ValueError):
+        db.query(select='month', return_type='xarray_lazy')